@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from agents.artifact_store import get_artifact_store # Aggregates are shared through the artifact store
+
+# Bumped whenever the layout changes, so older checkpointed aggregates are rebuilt rather than merged
+AGGREGATES_VERSION = 2
+
+
+def partial_aggregates(df: pd.DataFrame) -> Dict[str, object]:
+    """Compute mergeable aggregates for one frame or chunk in a single vectorized pass."""
+    month = df['Date'].dt.to_period('M').astype(str)
+    measures = df[['Revenue', 'Units_Sold']]
+    units = df['Units_Sold'].to_numpy(dtype=float)
+    revenue = df['Revenue'].to_numpy(dtype=float)
+    # Unit price is undefined for rows without units sold
+    unit_price = np.divide(revenue, units, out=np.full_like(revenue, np.nan), where=units > 0)
+    unit_price = unit_price[~np.isnan(unit_price)]
+    return {
+        "version": AGGREGATES_VERSION,
+        "rows": len(df),
+        "date_min": df['Date'].min(),
+        "date_max": df['Date'].max(),
+        "monthly": measures.groupby(month).sum(),
+        "product": measures.groupby(df['Product_Name']).sum(),
+        "category": measures.groupby(df['Product_Category']).sum(),
+        "product_month": df['Revenue'].groupby([df['Product_Name'], month]).sum(),
+        # Sum and count rather than a mean, so appended rows can be merged in
+        "category_date": df['Revenue'].groupby([df['Product_Category'], df['Date']]).agg(['sum', 'count']),
+        "price_count": unit_price.size,
+        "price_sum": unit_price.sum(),
+        "price_sumsq": np.square(unit_price).sum(),
+        "price_min": unit_price.min() if unit_price.size else np.nan,
+        "price_max": unit_price.max() if unit_price.size else np.nan,
+        # Date-range index: one entry per processed frame/chunk, in the order of processed_data_ref
+        "parts": [{
+            "rows": len(df),
+            "date_min": df['Date'].min(),
+            "date_max": df['Date'].max(),
+            "sorted": bool(df['Date'].is_monotonic_increasing),
+        }],
+    }
+
+
+def merge_aggregates(left: Dict[str, object], right: Dict[str, object]) -> Dict[str, object]:
+    """Combine two partial aggregates, e.g. from consecutive chunks."""
+    merged = {"version": AGGREGATES_VERSION}
+    for key in ("monthly", "product", "category", "product_month", "category_date"):
+        merged[key] = left[key].add(right[key], fill_value=0)
+    for key in ("rows", "price_count", "price_sum", "price_sumsq"):
+        merged[key] = left[key] + right[key]
+    merged["date_min"] = min(left["date_min"], right["date_min"])
+    merged["date_max"] = max(left["date_max"], right["date_max"])
+    merged["price_min"] = np.fmin(left["price_min"], right["price_min"])
+    merged["price_max"] = np.fmax(left["price_max"], right["price_max"])
+    merged["parts"] = left["parts"] + right["parts"]
+    return merged
+
+
+def aggregate_frames(frames: Iterable[pd.DataFrame], base: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Fold frames (e.g. chunks or newly appended rows) into `base` one at a time."""
+    agg = base
+    for frame in frames:
+        partial = partial_aggregates(frame)
+        agg = partial if agg is None else merge_aggregates(agg, partial)
+    if agg is None:
+        raise ValueError("No data to summarize.")
+    return agg
+
+
+def is_current(agg: Optional[Dict[str, object]]) -> bool:
+    """Whether `agg` (e.g. loaded from a checkpoint) has the current layout and can be merged into."""
+    return agg is not None and agg.get("version") == AGGREGATES_VERSION
+
+
+def state_aggregates(state) -> Optional[Dict[str, object]]:
+    """The aggregates materialized by the preprocessor for this session, if any."""
+    ref = state.get("aggregates_ref")
+    store = get_artifact_store()
+    if ref and ref in store:
+        return store.get(ref)
+    return None
+
+
+# --- Views used by downstream stages -------------------------------------------
+
+def product_revenue(agg: Dict[str, object]) -> pd.Series:
+    """Total revenue per product, highest first."""
+    return agg["product"]['Revenue'].sort_values(ascending=False)
+
+
+def category_date_revenue(agg: Dict[str, object]) -> pd.Series:
+    """Mean revenue per (category, date), as plotted by the revenue-over-time chart."""
+    by_date = agg["category_date"].sort_index()
+    return (by_date['sum'] / by_date['count']).rename('Revenue')
+
+
+def frames_in_range(ref: Union[str, List[str]], agg: Dict[str, object],
+                    start=None, end=None) -> Iterator[pd.DataFrame]:
+    """Rows with `start <= Date <= end`, reading only the chunks whose date range overlaps.
+
+    Within a chunk whose dates are sorted the bounds are found by binary search
+    instead of a full comparison pass.
+    """
+    refs = [ref] if isinstance(ref, str) else ref
+    parts = agg["parts"]
+    if len(parts) != len(refs):
+        # The index does not describe these refs; fall back to scanning every chunk
+        parts = [None] * len(refs)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    store = get_artifact_store()
+    for handle, part in zip(refs, parts):
+        if part is not None and ((start is not None and part["date_max"] < start) or
+                                 (end is not None and part["date_min"] > end)):
+            continue
+        df = store.get(handle)
+        if part is not None and part["sorted"]:
+            dates = df['Date'].to_numpy()
+            lo = 0 if start is None else int(np.searchsorted(dates, start.to_datetime64(), side="left"))
+            hi = len(df) if end is None else int(np.searchsorted(dates, end.to_datetime64(), side="right"))
+            yield df.iloc[lo:hi]
+        else:
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= df['Date'] >= start
+            if end is not None:
+                mask &= df['Date'] <= end
+            yield df[mask]
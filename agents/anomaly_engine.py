@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Measures checked for outliers; Unit_Price is derived as Revenue / Units_Sold
+METRICS = ["Units_Sold", "Revenue", "Unit_Price"]
+# Peer groups a row is compared against. Products in one category differ in price and volume, so the
+# category level compares each value's deviation from its own product's median, in units of the product's MAD.
+GROUP_LEVELS = {"product": "Product_Name", "category": "Product_Category"}
+RELATIVE_LEVELS = {"category"}
+
+DEFAULT_WINDOW = 30 # Preceding observations in the rolling baseline
+DEFAULT_MIN_PERIODS = 3 # Baseline size required before a rolling z-score is trusted
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MAD_THRESHOLD = 5.0 # Modified z-score cut-off; 3.5 (Iglewicz-Hoaglin) flags Poisson-like demand tails
+DEFAULT_IQR_K = 3.0 # Tukey's "far out" fences
+DEFAULT_MIN_RULES = 2 # Rules (z-score, MAD, IQR) that must agree before a value is flagged
+DEFAULT_MAX_REPORTED = 20 # Flagged rows passed on to the LLM
+
+_BASE_COLUMNS = ["Date", "Product_Name", "Product_Category"]
+
+
+def _per_row(grouped_stat: pd.DataFrame, index: pd.Index) -> pd.DataFrame:
+    """Align a groupby().rolling() result (group level + row index) back to the frame's rows."""
+    return grouped_stat.reset_index(level=0, drop=True).reindex(index)
+
+
+def detect_anomalies(df: pd.DataFrame, window: int = DEFAULT_WINDOW,
+                     min_periods: int = DEFAULT_MIN_PERIODS,
+                     z_threshold: float = DEFAULT_Z_THRESHOLD,
+                     mad_threshold: float = DEFAULT_MAD_THRESHOLD,
+                     iqr_k: float = DEFAULT_IQR_K,
+                     min_rules: int = DEFAULT_MIN_RULES) -> pd.DataFrame:
+    """Flag outliers per product and per category with rolling z-score, MAD and IQR rules.
+
+    At the category level each value is first standardized against its product's
+    median and MAD, so a product that is simply pricier than its peers is not an
+    outlier. Every statistic is a grouped, vectorized pandas/NumPy operation, so
+    the cost is a handful of passes over the data regardless of the number of
+    groups. Returns
+    one row per (input row, group level, metric) that tripped at least
+    `min_rules` rules, sorted by severity; the index identifies the input row, so
+    one row can carry several flags. `value` and the IQR fences are always in
+    the metric's own units.
+    """
+    frame = df[_BASE_COLUMNS + ["Units_Sold", "Revenue"]].sort_values("Date", kind="stable").reset_index(drop=True)
+    units = frame["Units_Sold"].to_numpy(dtype=float)
+    revenue = frame["Revenue"].to_numpy(dtype=float)
+    frame = frame.assign(Unit_Price=np.divide(revenue, units, out=np.full_like(revenue, np.nan), where=units > 0))
+    values = frame[METRICS].astype(float)
+    # Product medians and MADs standardize values for the category level; a product with no spread is skipped there
+    product_median = values.groupby(frame["Product_Name"], sort=False).transform("median")
+    product_mad = (values - product_median).abs().groupby(frame["Product_Name"], sort=False).transform("median")
+    product_mad = product_mad.where(product_mad > 0)
+
+    flagged = []
+    for level, key in GROUP_LEVELS.items():
+        groups = frame[key]
+        if level in RELATIVE_LEVELS:
+            center, scale = product_median, product_mad
+        else:
+            center, scale = 0.0, 1.0
+        level_values = (values - center) / scale
+        grouped = level_values.groupby(groups, sort=False)
+
+        # Rolling baseline built only from each row's predecessors within its group
+        rolling = grouped.rolling(window, min_periods=min_periods, closed="left")
+        roll_mean = _per_row(rolling.mean(), frame.index)
+        roll_std = _per_row(rolling.std(), frame.index)
+        zscore = (level_values - roll_mean) / roll_std.where(roll_std > 0)
+
+        # Robust (modified) z-score from the group median and median absolute deviation
+        median = grouped.transform("median")
+        deviation = level_values - median
+        mad = deviation.abs().groupby(groups, sort=False).transform("median")
+        robust_z = 0.6745 * deviation / mad.where(mad > 0)
+
+        # Tukey fences from the group quartiles
+        quartiles = grouped.quantile([0.25, 0.75])
+        q1 = quartiles.xs(0.25, level=1).reindex(groups).set_axis(frame.index)
+        q3 = quartiles.xs(0.75, level=1).reindex(groups).set_axis(frame.index)
+        iqr = q3 - q1
+        low, high = q1 - iqr_k * iqr, q3 + iqr_k * iqr
+
+        z_flag = zscore.abs() > z_threshold
+        mad_flag = robust_z.abs() > mad_threshold
+        iqr_flag = (level_values < low) | (level_values > high)
+        # A single rule trips on ordinary demand tails; flags need `min_rules` of them to agree
+        any_flag = z_flag.astype(int) + mad_flag.astype(int) + iqr_flag.astype(int) >= min_rules
+        # Fences back in the metric's own units, per row
+        low, high = center + low * scale, center + high * scale
+
+        for metric in METRICS:
+            mask = any_flag[metric].to_numpy()
+            if not mask.any():
+                continue
+            methods = np.char.add(
+                np.char.add(np.where(z_flag[metric].to_numpy()[mask], "zscore ", ""),
+                            np.where(mad_flag[metric].to_numpy()[mask], "mad ", "")),
+                np.where(iqr_flag[metric].to_numpy()[mask], "iqr", ""))
+            z_values = zscore[metric].to_numpy()[mask]
+            robust_values = robust_z[metric].to_numpy()[mask]
+            flagged.append(frame.loc[mask, _BASE_COLUMNS].assign(
+                group_level=level,
+                metric=metric,
+                value=values[metric].to_numpy()[mask],
+                rolling_zscore=z_values,
+                robust_zscore=robust_values,
+                iqr_low=low[metric].to_numpy()[mask],
+                iqr_high=high[metric].to_numpy()[mask],
+                methods=np.char.strip(methods),
+                severity=np.fmax(np.abs(z_values), np.abs(robust_values)),
+            ))
+
+    if not flagged:
+        return pd.DataFrame(columns=_BASE_COLUMNS + [
+            "group_level", "metric", "value", "rolling_zscore", "robust_zscore",
+            "iqr_low", "iqr_high", "methods", "severity"])
+    result = pd.concat(flagged)
+    return result.sort_values("severity", ascending=False, na_position="last", kind="stable")
+
+
+def _round(value) -> Optional[float]:
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def summarize_anomalies(anomalies: pd.DataFrame, rows_scanned: int,
+                        max_reported: int = DEFAULT_MAX_REPORTED) -> Dict[str, object]:
+    """Compact, JSON-serializable view of the engine output for state and prompts."""
+    top: List[Dict[str, object]] = [
+        {
+            "date": str(pd.Timestamp(row.Date).date()),
+            "product": row.Product_Name,
+            "category": row.Product_Category,
+            "compared_within": row.group_level,
+            "metric": row.metric,
+            "value": _round(row.value),
+            "rolling_zscore": _round(row.rolling_zscore),
+            "robust_zscore": _round(row.robust_zscore),
+            "expected_range": [_round(row.iqr_low), _round(row.iqr_high)],
+            "methods": row.methods,
+        }
+        for row in anomalies.head(max_reported).itertuples()
+    ]
+    return {
+        "rows_scanned": int(rows_scanned),
+        "flag_count": int(len(anomalies)),
+        "flagged_rows": int(anomalies.index.nunique()), # Distinct rows; a row may be flagged per level and metric
+        "flags_by_metric": {k: int(v) for k, v in anomalies["metric"].value_counts().items()},
+        "top_flags": top,
+    }
+
+
+def format_anomaly_report(summary: Dict[str, object]) -> str:
+    """Plain-text report built from the engine's findings, used when the LLM is unavailable."""
+    lines = ["## Anomaly Detection Report", ""]
+    if not summary["flag_count"]:
+        lines.append(f"No anomalies detected across {summary['rows_scanned']} rows "
+                     "(rolling z-score, MAD and IQR checks per product and category).")
+        return "\n".join(lines)
+
+    lines.append(f"**Key Findings:** {summary['flag_count']} flags on {summary['flagged_rows']} of "
+                 f"{summary['rows_scanned']} rows")
+    for flag in summary["top_flags"]:
+        low, high = flag["expected_range"]
+        lines.append(
+            f"• **{flag['product']}** ({flag['category']}) on {flag['date']}: {flag['metric']} = {flag['value']} "
+            f"(typical {flag['compared_within']} range [{low}, {high}], flagged by {flag['methods']})"
+        )
+    return "\n".join(lines)
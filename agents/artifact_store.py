@@ -0,0 +1,215 @@
+import atexit
+import os # For the optional on-disk Arrow directory
+import shutil
+import tempfile
+import threading # Stages may run concurrently, so guard the handle table
+import uuid # For unique artifact handles
+from collections import OrderedDict # Least-recently-used order of in-memory frames
+from typing import Dict, List, Optional, Union
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather # Arrow IPC files, readable via memory mapping
+except ImportError: # pyarrow is optional; without it the store stays purely in-memory
+    feather = None
+
+
+class ArtifactStore:
+    """Shared in-process store that hands DataFrames between pipeline stages by reference.
+
+    Agents `put` a DataFrame and keep only the returned handle in session state,
+    so the dataset is never serialized to JSON and reparsed by every stage.
+    When `root` is given (and pyarrow is installed) frames are written as
+    uncompressed Arrow IPC files and read back memory-mapped.
+
+    With `memory_budget_mb`, frames stay in memory until their total size exceeds
+    the budget; the least recently used ones are then spilled to `spill_dir`
+    (a temporary directory by default) and transparently read back on `get`.
+    Spilled frames are compressed unless `spill_compression="uncompressed"`,
+    which trades disk space for memory-mapped reads.
+
+    `put(..., on_disk=True)` writes a frame straight to a spill file, e.g. for
+    streamed chunks that must not accumulate in memory whatever the budget.
+
+    Small non-tabular artifacts (e.g. the preprocessor's materialized
+    aggregates) are accepted too; they always stay in memory.
+    """
+
+    def __init__(self, root: Optional[str] = None, memory_map: bool = True,
+                 memory_budget_mb: Optional[float] = None, spill_dir: Optional[str] = None,
+                 spill_compression: str = "zstd"):
+        self.root = root
+        self.memory_map = memory_map
+        self.memory_budget = memory_budget_mb * 2**20 if memory_budget_mb is not None else None
+        self.spill_dir = spill_dir
+        self.spill_compression = spill_compression
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._paths: Dict[str, str] = {}
+        self._spilled: Dict[str, str] = {} # Handles whose frame currently lives only in a spill file
+        self._objects: Dict[str, object] = {} # Non-frame artifacts
+        self._memory_bytes = 0
+        self._spills = 0
+        self._disk_reads = 0
+        self._lock = threading.Lock()
+
+    def put(self, df: Union[pd.DataFrame, Dict[str, object]], name: str = "frame", on_disk: bool = False) -> str:
+        handle = f"{name}-{uuid.uuid4().hex[:12]}"
+        if not isinstance(df, pd.DataFrame):
+            with self._lock:
+                self._objects[handle] = df
+        elif self.root and feather is not None:
+            os.makedirs(self.root, exist_ok=True)
+            path = os.path.join(self.root, f"{handle}.arrow")
+            # Uncompressed so the file can be memory-mapped without a decode pass
+            feather.write_feather(df, path, compression="uncompressed")
+            with self._lock:
+                self._paths[handle] = path
+        elif on_disk:
+            size = int(df.memory_usage(deep=True).sum())
+            with self._lock:
+                self._spilled[handle] = self._write_spill(handle, df)
+                self._sizes[handle] = size
+        else:
+            size = int(df.memory_usage(deep=True).sum()) if self.memory_budget is not None else 0
+            with self._lock:
+                self._frames[handle] = df
+                self._sizes[handle] = size
+                self._memory_bytes += size
+                self._enforce_budget()
+        return handle
+
+    def get(self, handle: str) -> pd.DataFrame:
+        with self._lock:
+            if handle in self._frames:
+                self._frames.move_to_end(handle) # Most recently used
+                return self._frames[handle]
+            if handle in self._objects:
+                return self._objects[handle]
+            spill_path = self._spilled.get(handle)
+            if spill_path is not None:
+                df = self._read_spilled(spill_path)
+                self._disk_reads += 1
+                if self.memory_budget is not None and self._sizes[handle] <= self.memory_budget:
+                    # Bring it back; colder frames are spilled in its place
+                    del self._spilled[handle]
+                    os.remove(spill_path)
+                    self._frames[handle] = df
+                    self._memory_bytes += self._sizes[handle]
+                    self._enforce_budget()
+                return df
+            path = self._paths.get(handle)
+        if path is None:
+            raise KeyError(f"Unknown artifact handle: {handle}")
+        return feather.read_table(path, memory_map=self.memory_map).to_pandas()
+
+    def delete(self, handle: str) -> None:
+        with self._lock:
+            if self._frames.pop(handle, None) is not None:
+                self._memory_bytes -= self._sizes[handle]
+            self._sizes.pop(handle, None)
+            self._objects.pop(handle, None)
+            path = self._paths.pop(handle, None) or self._spilled.pop(handle, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def clear(self) -> None:
+        with self._lock:
+            handles = list(self._frames) + list(self._paths) + list(self._spilled) + list(self._objects)
+        for handle in handles:
+            self.delete(handle)
+
+    def __contains__(self, handle: object) -> bool:
+        with self._lock:
+            return (handle in self._frames or handle in self._paths or handle in self._spilled
+                    or handle in self._objects)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "in_memory_mb": round(self._memory_bytes / 2**20, 1),
+                "spilled_mb": round(sum(self._sizes[h] for h in self._spilled) / 2**20, 1),
+                "spills": self._spills,
+                "disk_reads": self._disk_reads,
+            }
+
+    # --- Spilling (called with the lock held) ------------------------------
+
+    def _enforce_budget(self) -> None:
+        if self.memory_budget is None:
+            return
+        while self._memory_bytes > self.memory_budget and self._frames:
+            handle, df = self._frames.popitem(last=False) # Least recently used
+            self._spilled[handle] = self._write_spill(handle, df)
+            self._memory_bytes -= self._sizes[handle]
+            self._spills += 1
+
+    def _write_spill(self, handle: str, df: pd.DataFrame) -> str:
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="mas-spill-")
+            atexit.register(shutil.rmtree, self.spill_dir, True)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        if feather is not None:
+            path = os.path.join(self.spill_dir, f"{handle}.arrow")
+            feather.write_feather(df, path, compression=self.spill_compression)
+        else:
+            path = os.path.join(self.spill_dir, f"{handle}.pkl.gz")
+            df.to_pickle(path, compression={"method": "gzip", "compresslevel": 1})
+        return path
+
+    def _read_spilled(self, path: str) -> pd.DataFrame:
+        if path.endswith(".arrow"):
+            # Memory mapping only avoids a copy for uncompressed files
+            return feather.read_table(path, memory_map=self.spill_compression == "uncompressed").to_pandas()
+        return pd.read_pickle(path)
+
+
+# Process-wide store shared by all agents; the orchestrator may replace it
+_default_store = ArtifactStore()
+
+
+def get_artifact_store() -> ArtifactStore:
+    return _default_store
+
+
+def set_artifact_store(store: ArtifactStore) -> None:
+    global _default_store
+    _default_store = store
+
+
+def load_frame(ref: Union[str, List[str]]) -> pd.DataFrame:
+    """Resolve a state reference to a DataFrame.
+
+    A reference is either a single handle or, for streamed (chunked) data,
+    a list of chunk handles that are concatenated in order.
+    """
+    store = get_artifact_store()
+    if isinstance(ref, str):
+        return store.get(ref)
+    return pd.concat([store.get(handle) for handle in ref], ignore_index=True)
+
+
+def release_state_artifacts(state) -> None:
+    """Delete every artifact referenced from a session's state (single handles or chunk lists)."""
+    store = get_artifact_store()
+    for value in list(state.values()):
+        refs = value if isinstance(value, list) else [value]
+        for ref in refs:
+            if isinstance(ref, str) and ref in store:
+                store.delete(ref)
+
+
+def _state_refs(value) -> List[str]:
+    refs = value if isinstance(value, list) else [value]
+    return [ref for ref in refs if isinstance(ref, str)]
+
+
+def release_state_keys(state, keys: List[str]) -> None:
+    """Drop the given keys from state and delete their artifacts, unless another key still references them."""
+    store = get_artifact_store()
+    still_used = {ref for key, value in state.items() if key not in keys for ref in _state_refs(value)}
+    for key in keys:
+        for ref in _state_refs(state.pop(key, None)):
+            if ref not in still_used and ref in store:
+                store.delete(ref)
+
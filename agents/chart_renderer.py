@@ -0,0 +1,171 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Points kept per plotted series; more than a chart can show at typical widths
+DEFAULT_MAX_POINTS = 2000
+DEFAULT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+# --- Shape-preserving downsampling ------------------------------------------
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the series' visual shape.
+
+    The first and last points are always kept; every bucket in between contributes
+    the point forming the largest triangle with the previously selected point and
+    the average of the next bucket, so peaks and troughs survive.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Per-bucket min/max: indices of each bucket's extremes, so no spike is lost."""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = np.arange(n) * ((threshold - 2) // 2) // n # Leaves room for the first and last points
+    grouped = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([[0, n - 1], grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()]))
+
+
+def downsample_revenue_series(daily: pd.Series, max_points: int = DEFAULT_MAX_POINTS,
+                              method: str = "lttb") -> pd.DataFrame:
+    """Downsample mean revenue per (category, date) to at most `max_points` per category."""
+    parts = []
+    for category, series in daily.groupby(level="Product_Category", sort=False):
+        series = series.droplevel("Product_Category")
+        y = series.to_numpy(dtype=float)
+        if method == "minmax":
+            keep = minmax_indices(y, max_points)
+        else:
+            x = (series.index - series.index[0]).total_seconds().to_numpy()
+            keep = lttb_indices(x, y, max_points)
+        parts.append(pd.DataFrame({"Date": series.index[keep], "Product_Category": category, "Revenue": y[keep]}))
+    if not parts:
+        return pd.DataFrame(columns=["Date", "Product_Category", "Revenue"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def prepare_revenue_series(df: pd.DataFrame, max_points: int = DEFAULT_MAX_POINTS,
+                           method: str = "lttb") -> pd.DataFrame:
+    """Revenue per (category, date), downsampled to at most `max_points` per category.
+
+    Rows sharing a date are averaged first (seaborn's default estimator), so the
+    plotted lines match the undownsampled chart wherever points are kept.
+    """
+    daily = df.groupby(["Product_Category", "Date"], sort=True)["Revenue"].mean()
+    return downsample_revenue_series(daily, max_points, method)
+
+
+# --- Renderers (run in worker processes) --------------------------------------
+
+def _init_worker() -> None:
+    # Non-interactive backend before anything (e.g. seaborn) imports pyplot
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _rotate_x_labels(ax) -> None:
+    ax.tick_params(axis="x", labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+
+
+def render_revenue_over_time(series: pd.DataFrame, title: str, path: str) -> float:
+    """Line chart of revenue per category; returns the render time in seconds."""
+    started = time.perf_counter()
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    sns.set_style("whitegrid")
+    fig = Figure(figsize=(12, 7)) # Object-oriented figure: no shared pyplot state
+    ax = fig.subplots()
+    # Points are already one per date, so seaborn has nothing to aggregate or bootstrap
+    sns.lineplot(data=series, x="Date", y="Revenue", hue="Product_Category", marker="o", errorbar=None, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Revenue ($)")
+    _rotate_x_labels(ax)
+    ax.legend(title="Product Category")
+    fig.tight_layout()
+    fig.savefig(path)
+    return time.perf_counter() - started
+
+
+def render_product_revenue(product_revenue: pd.Series, title: str, path: str) -> float:
+    """Bar chart of total revenue per product; returns the render time in seconds."""
+    started = time.perf_counter()
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    sns.set_style("whitegrid")
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
+    sns.barplot(x=product_revenue.index, y=product_revenue.values, hue=product_revenue.index,
+                palette="viridis", legend=False, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel("Product Name")
+    ax.set_ylabel("Total Revenue ($)")
+    _rotate_x_labels(ax)
+    fig.tight_layout()
+    fig.savefig(path)
+    return time.perf_counter() - started
+
+
+# --- Process pool ---------------------------------------------------------------
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool shared by every session; workers are started on first use and reused."""
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and worker threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=DEFAULT_RENDER_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_init_worker)
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+async def render_charts(jobs: List[Tuple[Callable[..., float], tuple]]) -> List[float]:
+    """Render independent charts in parallel in the pool; returns each chart's render time."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    try:
+        return list(await asyncio.gather(*(loop.run_in_executor(pool, renderer, *args) for renderer, args in jobs)))
+    except BrokenProcessPool:
+        # A crashed worker breaks the whole pool; start a fresh one on the next call
+        if _pool is pool:
+            _pool = None
+        raise
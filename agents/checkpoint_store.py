@@ -0,0 +1,259 @@
+import glob
+import hashlib # For source fingerprints and stage input versions
+import io
+import json
+import os
+import pickle # Running aggregates are plain pandas objects
+import shutil
+import uuid # Unique names for processed parts
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(".cache", "checkpoints")
+# Size of the byte blocks hashed to detect rewrites of already-ingested data
+_BLOCK_BYTES = 64 * 1024
+
+
+def _hash_range(path: str, start: int, end: int) -> str:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(max(0, end - start))).hexdigest()
+
+
+def version_of(*parts: object) -> str:
+    """Short, stable version string for a stage's inputs."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def build_manifest(path: str, offset: int, rows: int, columns: List[str],
+                   selected: List[str]) -> Dict[str, object]:
+    """Fingerprint the first `offset` bytes of an append-only source.
+
+    The first and last blocks of the ingested range are hashed: a rewrite of the
+    header or of the most recently ingested rows forces a full recompute, while
+    bytes after `offset` are treated as appended rows. `columns` are all the
+    columns in the file, `selected` the ones the checkpointed data was read with.
+    """
+    head_hash = _hash_range(path, 0, min(offset, _BLOCK_BYTES))
+    tail_hash = _hash_range(path, max(0, offset - _BLOCK_BYTES), offset)
+    return {
+        "source": os.path.abspath(path),
+        "columns": list(columns),
+        "selected": list(selected),
+        "offset": offset,
+        "rows": rows,
+        "head_hash": head_hash,
+        "tail_hash": tail_hash,
+        "version": version_of(rows, offset, head_hash, tail_hash, *selected),
+    }
+
+
+def complete_rows_end(path: str, size: int) -> int:
+    """Offset just past the last newline in the first `size` bytes.
+
+    A source that is still being written may end in a partial row; it is left
+    for the next run, once its newline has been written.
+    """
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - _BLOCK_BYTES)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+class BoundedReader(io.RawIOBase):
+    """Read-only view of the first `limit` bytes of a file, so a parser stops at a planned offset."""
+
+    def __init__(self, path: str, limit: int):
+        self._file = open(path, "rb")
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def read_appended_rows(path: str, start: int, end: int, columns: List[str]) -> pd.DataFrame:
+    """Parse only the rows written between two byte offsets of a CSV file (both at row boundaries)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns)
+
+
+class CheckpointStore:
+    """On-disk checkpoints that let pipeline runs over an append-only source be incremental.
+
+    For each source it keeps the ingest manifest, the processed data as a list of
+    parts (one per run that added rows), running aggregates, and the outputs of
+    each stage together with the version of the inputs they were computed from.
+
+    The manifest lists the processed parts it covers and is written last, so a
+    run that fails half-way leaves at most unlisted part files behind; they are
+    never loaded and are removed by the next commit.
+    """
+
+    def __init__(self, root: str = DEFAULT_CHECKPOINT_DIR):
+        self.root = root
+
+    def _dir(self, source: str) -> str:
+        key = hashlib.sha256(os.path.abspath(source).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, key)
+
+    def _read_json(self, source: str, name: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._dir(source), name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, source: str, name: str, payload: dict) -> None:
+        directory = self._dir(source)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(f"{path}.tmp", path) # Atomic, so a crash never leaves a torn manifest
+
+    # --- Source tracking -------------------------------------------------
+
+    def plan_ingest(self, path: str, selected: List[str]) -> Dict[str, object]:
+        """Decide whether `path`, read with the `selected` columns, needs a full read, only its appended rows, or nothing.
+
+        `end` is the offset the read must stop at: the end of the last complete
+        row at planning time, whatever is appended while the run reads.
+        """
+        size = os.path.getsize(path)
+        manifest = self._read_json(path, "manifest.json")
+        plan = {"mode": "full", "start": 0, "end": complete_rows_end(path, size), "manifest": manifest}
+        # Manifests without a parts list predate atomic commits; rebuild rather than trust the part files
+        if manifest is None or "parts" not in manifest or plan["end"] < manifest["offset"]:
+            return plan
+        # Checkpointed rows read with other columns cannot be extended
+        if manifest.get("selected") != list(selected):
+            return plan
+        offset = manifest["offset"]
+        if (_hash_range(path, 0, min(offset, _BLOCK_BYTES)) != manifest["head_hash"]
+                or _hash_range(path, max(0, offset - _BLOCK_BYTES), offset) != manifest["tail_hash"]):
+            return plan
+        plan["mode"] = "unchanged" if plan["end"] == offset else "append"
+        plan["start"] = offset
+        return plan
+
+    def commit_manifest(self, path: str, manifest: Dict[str, object], parts: List[str]) -> None:
+        """Atomically make `parts` (from `write_processed_part`) the processed data covered by `manifest`."""
+        self._write_json(path, "manifest.json", {**manifest, "parts": list(parts)})
+        listed = set(parts)
+        for stale in glob.glob(os.path.join(self._dir(path), "processed-*.pkl")):
+            if os.path.basename(stale) not in listed: # Left behind by a run that failed before committing
+                os.remove(stale)
+
+    # --- Processed data parts ---------------------------------------------
+
+    def processed_parts(self, source: str) -> List[str]:
+        """Names of the processed parts covered by the committed manifest, in order."""
+        manifest = self._read_json(source, "manifest.json")
+        return list(manifest.get("parts", [])) if manifest else []
+
+    def load_processed_parts(self, source: str) -> Iterable[pd.DataFrame]:
+        for name in self.processed_parts(source):
+            yield pd.read_pickle(os.path.join(self._dir(source), name))
+
+    def write_processed_part(self, source: str, df: pd.DataFrame) -> str:
+        """Write a part file; it only counts once a manifest listing it is committed."""
+        directory = self._dir(source)
+        os.makedirs(directory, exist_ok=True)
+        name = f"processed-{uuid.uuid4().hex[:12]}.pkl"
+        df.to_pickle(os.path.join(directory, name))
+        return name
+
+    def reset(self, source: str) -> None:
+        """Drop every checkpoint for a source, e.g. after it was rewritten."""
+        shutil.rmtree(self._dir(source), ignore_errors=True)
+
+    # --- Running aggregates -----------------------------------------------
+
+    def load_aggregates(self, source: str, data_version: str) -> Optional[dict]:
+        path = os.path.join(self._dir(source), f"aggregates-{data_version}.pkl")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save_aggregates(self, source: str, data_version: str, aggregates: dict) -> None:
+        directory = self._dir(source)
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, "aggregates-*.pkl")):
+            os.remove(stale)
+        with open(os.path.join(directory, f"aggregates-{data_version}.pkl"), "wb") as f:
+            pickle.dump(aggregates, f)
+
+    # --- Stage outputs ----------------------------------------------------
+
+    def load_stage_outputs(self, source: str, stage: str, input_version: str) -> Optional[Dict[str, object]]:
+        entry = self._read_json(source, f"stage-{stage}.json")
+        if entry is None or entry["input_version"] != input_version:
+            return None
+        return entry["outputs"]
+
+    def save_stage_outputs(self, source: str, stage: str, input_version: str, outputs: Dict[str, object]) -> None:
+        self._write_json(source, f"stage-{stage}.json", {"input_version": input_version, "outputs": outputs})
+
+
+# Incremental mode is off unless the orchestrator installs a store
+_default_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    return _default_store
+
+
+def set_checkpoint_store(store: Optional[CheckpointStore]) -> None:
+    global _default_store
+    _default_store = store
+
+
+def restore_stage(state, stage: str, input_version: str) -> bool:
+    """Copy a stage's checkpointed outputs into state if its inputs are unchanged."""
+    store = get_checkpoint_store()
+    source = state.get("data_source")
+    if store is None or source is None:
+        return False
+    outputs = store.load_stage_outputs(source, stage, input_version)
+    if outputs is None:
+        return False
+    for key, value in outputs.items():
+        state[key] = value
+    return True
+
+
+def record_stage(state, stage: str, input_version: str, keys: List[str]) -> None:
+    """Checkpoint the given state keys as the outputs of a stage."""
+    store = get_checkpoint_store()
+    source = state.get("data_source")
+    if store is None or source is None:
+        return
+    store.save_stage_outputs(source, stage, input_version, {key: state[key] for key in keys if key in state})
+
+
+def stage_status_text(stage: str, reused: bool) -> str:
+    if reused:
+        return f"{stage}: reused checkpointed output (inputs unchanged)."
+    return f"{stage}: recomputed."
@@ -2,28 +2,97 @@ from google.adk.agents import BaseAgent # Core ADK classes
 from google.adk.events import Event # Correct Event import for ADK
 from google.adk.agents.invocation_context import InvocationContext # For state and context
 from google.genai.types import Content, Part # For creating proper content
-import pandas as pd # For data manipulation
-from typing import AsyncGenerator # For async generator type hint
+import asyncio # For running blocking file reads off the event loop
+import os
+from typing import AsyncGenerator, Optional # For async generator type hint
+from agents.artifact_store import get_artifact_store # Shared DataFrame handoff between stages
+from agents.checkpoint_store import build_manifest, get_checkpoint_store, read_appended_rows, stage_status_text # Incremental runs
+from agents.data_sources import DataSource, SourceFilters, open_source # CSV, Parquet/Feather and SQLite readers with pushdown
+from agents.tracing import record_metrics # Per-stage rows for the pipeline trace
+
+# Rows sampled to estimate the in-memory size of one source row
+_SIZE_SAMPLE_ROWS = 1000
+
+
+def estimate_chunk_rows(source: DataSource, memory_budget_mb: float) -> int:
+    """Pick a chunk size so that one parsed chunk stays within the memory budget."""
+    sample = source.sample(_SIZE_SAMPLE_ROWS)
+    if sample.empty:
+        return _SIZE_SAMPLE_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    return max(1, int(memory_budget_mb * 2**20 // bytes_per_row))
+
 
 class DataCollectorAgent(BaseAgent):
+    source_path: str = "data/sample_sales_data.csv"
+    chunk_rows: Optional[int] = None # Streaming mode: rows per chunk
+    memory_budget_mb: Optional[float] = None # Streaming mode: size chunks to fit this budget
+
+    def __init__(self, name: str, source_path: str = "data/sample_sales_data.csv",
+                 chunk_rows: Optional[int] = None, memory_budget_mb: Optional[float] = None):
+        super().__init__(name=name)
+        object.__setattr__(self, 'source_path', source_path)
+        object.__setattr__(self, 'chunk_rows', chunk_rows)
+        object.__setattr__(self, 'memory_budget_mb', memory_budget_mb)
+
     # _run_async_impl is the heart of a BaseAgent's execution logic
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
         agent_name = self.name # Accessing the agent's configured name
         print(f"[{agent_name}]: Collecting data...")
+        # A session may name its own source and filters (e.g. in batch runs); otherwise use the configured path
+        source_path = ctx.session.state.get("source_path", self.source_path)
         try:
-            # In a real scenario, this could be an API call, database query, etc.
-            # For this tutorial, we load from a predefined CSV file.
-            df = pd.read_csv("data/sample_sales_data.csv")
-            
-            # Store the collected data (as a JSON string for easy serialization) into the shared session state.
-            # This makes it accessible to the next agent in the pipeline.
-            ctx.session.state["raw_data_json"] = df.to_json(orient="records")
-            
-            # Create proper Event with Content
-            content = Content(parts=[Part(text="Data collection complete. Raw data loaded and stored in state.")])
-            yield Event(content=content, author=agent_name)
+            ctx.session.state["data_source"] = source_path
+            source = await asyncio.to_thread(open_source, source_path, SourceFilters.from_state(ctx.session.state),
+                                             ctx.session.state.get("source_table"))
+            print(f"[{agent_name}]: Reading {source.describe()}")
+            checkpoints = get_checkpoint_store()
+            plan = None
+            if checkpoints is not None and not source.supports_append:
+                print(f"[{agent_name}]: Incremental ingestion needs an unfiltered CSV source; reading the selection in full")
+            elif checkpoints is not None:
+                # Incremental mode: only rows appended since the last checkpoint are read
+                plan = await asyncio.to_thread(checkpoints.plan_ingest, source_path, source.filters.columns)
+                # Stop at the planned offset: rows still being appended are read by the next run
+                source.end_offset = plan["end"]
+                if plan["mode"] != "full":
+                    async for event in self._collect_incremental(ctx, source, plan):
+                        yield event
+                    return
+
+            shape = {}
+            if self.chunk_rows or self.memory_budget_mb:
+                async for event in self._collect_streaming(ctx, source, shape):
+                    yield event
+            else:
+                # Only the selected columns and rows are read, off the event loop
+                df = await asyncio.to_thread(source.read)
+                if df.empty:
+                    raise ValueError(f"No rows in {source.describe()}")
+                shape.update(rows=len(df))
+                record_metrics(rows_out=len(df))
+
+                # Store the collected DataFrame in the shared artifact store and keep only its handle
+                # in session state. This makes it accessible to the next agent without a JSON round-trip.
+                ctx.session.state["raw_data_ref"] = get_artifact_store().put(df, name="raw_data")
+
+                # Create proper Event with Content
+                content = Content(parts=[Part(text="Data collection complete. Raw data loaded and stored in state.")])
+                yield Event(content=content, author=agent_name)
+
+            if plan is not None:
+                # The preprocessor commits this manifest once the cleaned rows are checkpointed. It records
+                # every column in the file, which appended rows are parsed with.
+                columns = await asyncio.to_thread(source.file_columns)
+                manifest = await asyncio.to_thread(build_manifest, source_path, plan["end"], shape["rows"], columns,
+                                                 source.filters.columns)
+                ctx.session.state["ingest_mode"] = "full"
+                ctx.session.state["pending_manifest"] = manifest
+                ctx.session.state["data_version"] = manifest["version"]
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
         except FileNotFoundError:
-            error_msg = f"Error: sample_sales_data.csv not found. Make sure it's in the 'data' directory."
+            error_msg = f"Error: {os.path.basename(source_path)} not found. Make sure it's in the '{os.path.dirname(source_path) or '.'}' directory."
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
             yield Event(content=content, author=agent_name, turn_complete=True)
@@ -31,4 +100,74 @@ class DataCollectorAgent(BaseAgent):
             error_msg = f"Error during data collection: {str(e)}"
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
-            yield Event(content=content, author=agent_name, turn_complete=True) 
\ No newline at end of file
+            yield Event(content=content, author=agent_name, turn_complete=True)
+
+    async def _collect_incremental(self, ctx: InvocationContext, source: DataSource, plan: dict) -> AsyncGenerator[Event, None]:
+        """Read nothing, or only the appended byte range, of a previously checkpointed source."""
+        agent_name = self.name
+        source_path = ctx.session.state["data_source"]
+        manifest = plan["manifest"]
+        if plan["mode"] == "unchanged":
+            ctx.session.state["ingest_mode"] = "unchanged"
+            ctx.session.state["raw_data_ref"] = []
+            ctx.session.state["data_version"] = manifest["version"]
+            print(f"[{agent_name}]: No new rows since the last run")
+            record_metrics(rows_out=0)
+            content = Content(parts=[Part(text=stage_status_text(agent_name, reused=True))])
+            yield Event(content=content, author=agent_name)
+            return
+
+        df = await asyncio.to_thread(read_appended_rows, source_path, plan["start"], plan["end"], manifest["columns"])
+        df = df[[column for column in df.columns if column in source.filters.columns]]
+        pending = await asyncio.to_thread(
+            build_manifest, source_path, plan["end"], manifest["rows"] + len(df), manifest["columns"], manifest["selected"]
+        )
+        ctx.session.state["ingest_mode"] = "append"
+        ctx.session.state["raw_data_ref"] = get_artifact_store().put(df, name="raw_data_appended")
+        ctx.session.state["pending_manifest"] = pending
+        ctx.session.state["previous_data_version"] = manifest["version"]
+        ctx.session.state["data_version"] = pending["version"]
+        print(f"[{agent_name}]: Read {len(df)} appended rows ({manifest['rows']} rows already checkpointed)")
+        record_metrics(rows_out=len(df))
+        content = Content(parts=[Part(text=f"{stage_status_text(agent_name, reused=False)} Read {len(df)} appended rows only.")])
+        yield Event(content=content, author=agent_name)
+
+    async def _collect_streaming(self, ctx: InvocationContext, source: DataSource, shape: dict) -> AsyncGenerator[Event, None]:
+        """Read the source in bounded chunks, storing each chunk as its own artifact.
+
+        Only one parsed chunk is held in memory at a time; `raw_data_ref` becomes
+        the ordered list of chunk handles for the chunk-aware preprocessor. The row
+        count is reported back through `shape`.
+        """
+        agent_name = self.name
+        source_path = ctx.session.state["data_source"]
+        chunk_rows = self.chunk_rows
+        if not chunk_rows:
+            chunk_rows = await asyncio.to_thread(estimate_chunk_rows, source, self.memory_budget_mb)
+        print(f"[{agent_name}]: Streaming {source_path} in chunks of {chunk_rows} rows")
+
+        store = get_artifact_store()
+        reader = source.iter_chunks(chunk_rows)
+        handles = []
+        total_rows = 0
+        try:
+            while True:
+                # Each chunk is read in a worker thread so other sessions keep running
+                chunk = await asyncio.to_thread(next, reader, None)
+                if chunk is None:
+                    break
+                # Kept on disk until the preprocessor cleans it, so memory holds one chunk at a time
+                handles.append(store.put(chunk, name=f"raw_data_chunk{len(handles)}", on_disk=True))
+                total_rows += len(chunk)
+                content = Content(parts=[Part(text=f"Loaded chunk {len(handles)} ({len(chunk)} rows, {total_rows} total).")])
+                yield Event(content=content, author=agent_name)
+        finally:
+            reader.close()
+        if not handles:
+            raise ValueError(f"No rows in {source.describe()}")
+
+        ctx.session.state["raw_data_ref"] = handles
+        shape.update(rows=total_rows)
+        record_metrics(rows_out=total_rows, chunks=len(handles))
+        content = Content(parts=[Part(text=f"Data collection complete. Streamed {total_rows} rows in {len(handles)} chunks.")])
+        yield Event(content=content, author=agent_name)
@@ -2,9 +2,27 @@ from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from google.adk.agents.invocation_context import InvocationContext
 from google.genai.types import Content, Part # For creating proper content
+import asyncio # For running cleaning off the event loop
 import pandas as pd
-from io import StringIO # For pandas JSON reading
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Tuple
+from agents.aggregates import aggregate_frames, is_current # Aggregates materialized once for every downstream stage
+from agents.artifact_store import get_artifact_store # Shared DataFrame handoff between stages
+from agents.checkpoint_store import get_checkpoint_store, stage_status_text # Incremental runs
+from agents.tracing import record_metrics # Per-stage rows for the pipeline trace
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the row-local cleaning steps; safe to run on a whole frame or a single chunk."""
+    # Example preprocessing steps:
+    # Handle missing values (proper way without warnings)
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    df[numeric_cols] = df[numeric_cols].fillna(0)
+
+    # Ensure 'Date' column is in datetime format
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
 
 class DataPreprocessorAgent(BaseAgent):
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
@@ -12,9 +30,10 @@ class DataPreprocessorAgent(BaseAgent):
         print(f"[{agent_name}]: Preprocessing data...")
         
         # Retrieve raw data from session state, put there by the DataCollectorAgent
-        raw_data_json = ctx.session.state.get("raw_data_json")
+        raw_data_ref = ctx.session.state.get("raw_data_ref")
+        ingest_mode = ctx.session.state.get("ingest_mode")
         
-        if not raw_data_json:
+        if not raw_data_ref and ingest_mode != "unchanged":
             error_msg = "Error: Raw data not found in state for preprocessing."
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
@@ -22,26 +41,137 @@ class DataPreprocessorAgent(BaseAgent):
             return # Stop if critical data is missing
 
         try:
-            # Fix pandas warning by using StringIO
-            df = pd.read_json(StringIO(raw_data_json), orient="records")
-            
-            # Example preprocessing steps:
-            # Handle missing values (proper way without warnings)
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            df[numeric_cols] = df[numeric_cols].fillna(0)
-            
-            # Ensure 'Date' column is in datetime format
-            if 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'])
+            if ingest_mode in ("append", "unchanged"):
+                async for event in self._preprocess_incremental(ctx, raw_data_ref, ingest_mode):
+                    yield event
+                return
+
+            if isinstance(raw_data_ref, list):
+                async for event in self._preprocess_chunks(ctx, raw_data_ref):
+                    yield event
+                return
+
+            # Copy so the raw artifact stays untouched for other consumers
+            df = get_artifact_store().get(raw_data_ref).copy()
+            df = await asyncio.to_thread(clean_frame, df)
+            agg = await asyncio.to_thread(aggregate_frames, [df])
             
             print(f"[{agent_name}]: Processed {len(df)} rows of data")
+            record_metrics(rows_in=len(df), rows_out=len(df))
 
-            # Store the processed data back into session state for the next agents
-            ctx.session.state["processed_data_json"] = df.to_json(orient="records")
+            # Store the processed data and its aggregates back into session state for the next agents
+            ctx.session.state["processed_data_ref"] = get_artifact_store().put(df, name="processed_data")
+            ctx.session.state["aggregates_ref"] = get_artifact_store().put(agg, name="aggregates")
             content = Content(parts=[Part(text="Data preprocessing complete. Processed data stored in state.")])
             yield Event(content=content, author=agent_name)
+            if ingest_mode == "full":
+                await asyncio.to_thread(self._checkpoint, ctx.session.state, [df], True, agg)
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
         except Exception as e:
             error_msg = f"Error during data preprocessing: {str(e)}"
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
-            yield Event(content=content, author=agent_name, turn_complete=True) 
\ No newline at end of file
+            yield Event(content=content, author=agent_name, turn_complete=True) 
+
+    async def _preprocess_chunks(self, ctx: InvocationContext, chunk_refs: list) -> AsyncGenerator[Event, None]:
+        """Clean streamed data chunk by chunk so the full frame is never materialized here.
+
+        Cleaned chunks are kept on disk like the raw ones; later stages read them
+        chunk by chunk (e.g. through the date index) or load them as needed.
+        """
+        agent_name = self.name
+        store = get_artifact_store()
+        processed_refs = []
+        total_rows = 0
+        agg = None
+        for i, chunk_ref in enumerate(chunk_refs, start=1):
+            chunk = await asyncio.to_thread(clean_frame, store.get(chunk_ref))
+            # Aggregated while the chunk is at hand, so no later stage rescans the data
+            agg = await asyncio.to_thread(aggregate_frames, [chunk], agg)
+            processed_refs.append(store.put(chunk, name=f"processed_data_chunk{i - 1}", on_disk=True))
+            # The raw chunk is not needed once cleaned; drop it to keep memory bounded
+            store.delete(chunk_ref)
+            total_rows += len(chunk)
+            content = Content(parts=[Part(text=f"Preprocessed chunk {i}/{len(chunk_refs)} ({len(chunk)} rows).")])
+            yield Event(content=content, author=agent_name)
+
+        print(f"[{agent_name}]: Processed {total_rows} rows of data in {len(chunk_refs)} chunks")
+        record_metrics(rows_in=total_rows, rows_out=total_rows, chunks=len(chunk_refs))
+        ctx.session.state["processed_data_ref"] = processed_refs
+        ctx.session.state["aggregates_ref"] = store.put(agg, name="aggregates")
+        content = Content(parts=[Part(text="Data preprocessing complete. Processed data stored in state.")])
+        yield Event(content=content, author=agent_name)
+        if ctx.session.state.get("ingest_mode") == "full":
+            # Chunks are loaded and written one at a time, so the checkpoint never holds the whole dataset
+            frames = (store.get(ref) for ref in processed_refs)
+            await asyncio.to_thread(self._checkpoint, ctx.session.state, frames, True, agg)
+            content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+            yield Event(content=content, author=agent_name)
+
+    async def _preprocess_incremental(self, ctx: InvocationContext, raw_data_ref, ingest_mode: str) -> AsyncGenerator[Event, None]:
+        """Reuse checkpointed clean rows and clean only the newly appended ones."""
+        agent_name = self.name
+        store = get_artifact_store()
+        source = ctx.session.state["data_source"]
+        # Earlier rows were cleaned by previous runs; their checkpointed parts become on-disk chunks
+        processed_refs, previous_rows = await asyncio.to_thread(self._restore_parts, source)
+
+        if ingest_mode == "append":
+            df = await asyncio.to_thread(clean_frame, store.get(raw_data_ref).copy())
+            processed_refs.append(store.put(df, name="processed_data_appended"))
+            # Fold only the appended rows into the aggregates of the previous version
+            base = await asyncio.to_thread(self._load_aggregates, source, ctx.session.state["previous_data_version"])
+            frames = [df] if base else (store.get(ref) for ref in processed_refs)
+            agg = await asyncio.to_thread(aggregate_frames, frames, base)
+            await asyncio.to_thread(self._checkpoint, ctx.session.state, [df], False, agg)
+            print(f"[{agent_name}]: Processed {len(df)} appended rows; reused {previous_rows} checkpointed rows")
+            record_metrics(rows_in=len(df), rows_out=len(df))
+            status = f"{stage_status_text(agent_name, reused=False)} Cleaned {len(df)} appended rows only."
+        else:
+            data_version = ctx.session.state["data_version"]
+            agg = await asyncio.to_thread(self._load_aggregates, source, data_version)
+            if agg is None:
+                agg = await asyncio.to_thread(aggregate_frames, (store.get(ref) for ref in processed_refs))
+                await asyncio.to_thread(get_checkpoint_store().save_aggregates, source, data_version, agg)
+            print(f"[{agent_name}]: Reused {previous_rows} checkpointed rows")
+            record_metrics(rows_in=0, rows_out=0)
+            status = stage_status_text(agent_name, reused=True)
+
+        ctx.session.state["processed_data_ref"] = processed_refs
+        ctx.session.state["aggregates_ref"] = store.put(agg, name="aggregates")
+        content = Content(parts=[Part(text=status)])
+        yield Event(content=content, author=agent_name)
+
+    @staticmethod
+    def _restore_parts(source: str) -> Tuple[List[str], int]:
+        """Store checkpointed parts as on-disk chunks, one part in memory at a time; returns their refs and row count."""
+        store = get_artifact_store()
+        refs, rows = [], 0
+        for i, part in enumerate(get_checkpoint_store().load_processed_parts(source)):
+            refs.append(store.put(part, name=f"processed_data_chunk{i}", on_disk=True))
+            rows += len(part)
+        return refs, rows
+
+    @staticmethod
+    def _load_aggregates(source: str, data_version: str) -> Optional[Dict[str, object]]:
+        """Checkpointed aggregates of a data version, unless missing or in an older layout."""
+        agg = get_checkpoint_store().load_aggregates(source, data_version)
+        return agg if is_current(agg) else None
+
+    @staticmethod
+    def _checkpoint(state, frames: Iterable[pd.DataFrame], reset: bool, aggregates: Dict[str, object]) -> None:
+        """Persist cleaned rows and their aggregates, then commit the ingest manifest that covers them.
+
+        `frames` may be a generator; each frame is written as its own part before the next is read.
+        """
+        checkpoints = get_checkpoint_store()
+        source = state["data_source"]
+        if reset:
+            checkpoints.reset(source)
+        parts = [] if reset else checkpoints.processed_parts(source)
+        for frame in frames:
+            parts.append(checkpoints.write_processed_part(source, frame))
+        checkpoints.save_aggregates(source, state["data_version"], aggregates)
+        # Parts written above only count once the manifest listing them is committed
+        checkpoints.commit_manifest(source, state["pending_manifest"], parts)
@@ -0,0 +1,306 @@
+import io
+import os # For source type detection and file sizes
+import sqlite3 # Local databases, read-only
+from contextlib import closing, contextmanager
+from typing import Iterator, List, Optional
+import pandas as pd
+from agents.checkpoint_store import BoundedReader # Stops CSV reads at a planned byte offset
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds # Column projection and predicate pushdown for Parquet/Feather
+except ImportError: # pyarrow is optional; without it only CSV and SQLite sources are available
+    pa = ds = None
+
+# Columns the pipeline reads; any other column in a source is never loaded
+PIPELINE_COLUMNS = ["Date", "Product_Name", "Product_Category", "Units_Sold", "Revenue"]
+COLUMNAR_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".feather": "feather", ".arrow": "feather"}
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+DATASET_SUFFIXES = (".csv",) + tuple(COLUMNAR_FORMATS) + SQLITE_SUFFIXES
+DEFAULT_TABLE = "sales"
+
+
+class SourceFilters:
+    """Which columns and rows of a source a session reads.
+
+    `start` and `end` are inclusive dates; `categories` keeps only those
+    product categories. `columns` adds columns to PIPELINE_COLUMNS, which are
+    always read. Built from the session's `source_filters` state entry,
+    e.g. {"start": "2024-12-01", "end": "2024-12-30", "categories": ["Gadgets"]}.
+    """
+
+    def __init__(self, start: Optional[str] = None, end: Optional[str] = None,
+                 categories: Optional[List[str]] = None, columns: Optional[List[str]] = None):
+        self.start = pd.Timestamp(start) if start else None
+        # Exclusive upper bound, so rows with a time of day on the end date are kept
+        self.end_before = pd.Timestamp(end).normalize() + pd.Timedelta(days=1) if end else None
+        self.categories = list(categories) if categories else None
+        self.columns = PIPELINE_COLUMNS + [column for column in columns or [] if column not in PIPELINE_COLUMNS]
+
+    @classmethod
+    def from_state(cls, state) -> "SourceFilters":
+        return cls(**(state.get("source_filters") or {}))
+
+    @property
+    def filters_rows(self) -> bool:
+        return self.start is not None or self.end_before is not None or self.categories is not None
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Filter rows in pandas, for readers that cannot push the predicates down."""
+        mask = pd.Series(True, index=df.index)
+        if self.start is not None or self.end_before is not None:
+            dates = pd.to_datetime(df['Date'])
+            if self.start is not None:
+                mask &= dates >= self.start
+            if self.end_before is not None:
+                mask &= dates < self.end_before
+        if self.categories is not None:
+            mask &= df['Product_Category'].isin(self.categories)
+        return df if mask.all() else df[mask].reset_index(drop=True)
+
+    def __str__(self) -> str:
+        parts = []
+        if self.start is not None:
+            parts.append(f"Date >= {self.start.date()}")
+        if self.end_before is not None:
+            parts.append(f"Date < {self.end_before.date()}")
+        if self.categories is not None:
+            parts.append(f"Product_Category in {self.categories}")
+        return " and ".join(parts) or "none"
+
+
+class DataSource:
+    """A readable dataset: the whole selection at once, in chunks, or a small sample."""
+    kind = "source"
+    supports_append = False # Whether byte-offset incremental ingestion applies
+
+    def __init__(self, path: str, filters: SourceFilters):
+        self.path = path
+        self.filters = filters
+
+    def read(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def iter_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def sample(self, rows: int) -> pd.DataFrame:
+        """Up to `rows` rows with the selected columns, e.g. to estimate the in-memory row size."""
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return f"{self.kind} {self.path} (filters: {self.filters})"
+
+
+class CsvSource(DataSource):
+    """CSV file: unused columns are skipped by the parser, rows are filtered as each chunk is parsed.
+
+    When `end_offset` is set (incremental runs), only the file's first `end_offset`
+    bytes are read, so rows appended while the run reads are left for the next one.
+    """
+    kind = "CSV"
+
+    def __init__(self, path: str, filters: SourceFilters):
+        super().__init__(path, filters)
+        # Appended rows can only be read by byte offset when every row of the file is kept
+        self.supports_append = not filters.filters_rows
+        self.end_offset: Optional[int] = None
+
+    @contextmanager
+    def _open(self):
+        if self.end_offset is None:
+            yield self.path
+            return
+        with io.BufferedReader(BoundedReader(self.path, self.end_offset)) as stream:
+            yield stream
+
+    def _usecols(self):
+        wanted = set(self.filters.columns)
+        return lambda column: column in wanted
+
+    def file_columns(self) -> List[str]:
+        """Every column in the file's header, in order (needed to parse rows appended after it)."""
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def read(self) -> pd.DataFrame:
+        with self._open() as source:
+            return self.filters.apply(pd.read_csv(source, usecols=self._usecols()))
+
+    def iter_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        with self._open() as source, pd.read_csv(source, usecols=self._usecols(), chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                chunk = self.filters.apply(chunk)
+                if len(chunk):
+                    yield chunk
+
+    def sample(self, rows: int) -> pd.DataFrame:
+        return pd.read_csv(self.path, usecols=self._usecols(), nrows=rows)
+
+
+class ArrowSource(DataSource):
+    """Parquet or Feather file, or a directory of them (optionally hive-partitioned, e.g. Product_Category=Gadgets/).
+
+    Only the selected columns are decoded, and the date/category predicates are
+    pushed into the scan: whole partitions and Parquet row groups whose
+    statistics rule them out are never read.
+    """
+
+    def __init__(self, path: str, filters: SourceFilters, file_format: str):
+        if ds is None:
+            raise ImportError(f"Reading {file_format} sources requires pyarrow")
+        super().__init__(path, filters)
+        self.kind = file_format.capitalize() + (" dataset" if os.path.isdir(path) else "")
+        self.dataset = ds.dataset(path, format=file_format, partitioning="hive")
+        names = self.dataset.schema.names
+        self.columns = [column for column in filters.columns if column in names]
+        self.expression = self._expression()
+
+    def _date_scalar(self, value: pd.Timestamp):
+        field_type = self.dataset.schema.field("Date").type
+        if pa.types.is_timestamp(field_type):
+            return pa.scalar(value.to_pydatetime(), type=field_type)
+        if pa.types.is_date(field_type):
+            return pa.scalar(value.date(), type=field_type)
+        if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+            return pa.scalar(str(value.date()), type=field_type) # ISO dates compare correctly as text
+        raise ValueError(f"Unsupported Date column type in {self.path}: {field_type}")
+
+    def _expression(self):
+        conditions = []
+        if self.filters.start is not None:
+            conditions.append(ds.field("Date") >= self._date_scalar(self.filters.start))
+        if self.filters.end_before is not None:
+            conditions.append(ds.field("Date") < self._date_scalar(self.filters.end_before))
+        if self.filters.categories is not None:
+            conditions.append(ds.field("Product_Category").isin(self.filters.categories))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def files_scanned(self) -> List[str]:
+        """Files that survive partition pruning for this selection."""
+        return [fragment.path for fragment in self.dataset.get_fragments(filter=self.expression)]
+
+    def read(self) -> pd.DataFrame:
+        return self.dataset.to_table(columns=self.columns, filter=self.expression).to_pandas()
+
+    def iter_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        # Record batches follow the files' row groups; they are regrouped into chunks of about chunk_rows
+        pending, rows = [], 0
+        for batch in self.dataset.to_batches(columns=self.columns, filter=self.expression, batch_size=chunk_rows):
+            if batch.num_rows == 0:
+                continue
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= chunk_rows:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, rows = [], 0
+        if pending:
+            yield pa.Table.from_batches(pending).to_pandas()
+
+    def sample(self, rows: int) -> pd.DataFrame:
+        return self.dataset.head(rows, columns=self.columns).to_pandas()
+
+
+class SqliteSource(DataSource):
+    """Table in a local SQLite database; columns and predicates become the SELECT list and WHERE clause.
+
+    Dates are compared as text, so the Date column must hold ISO-8601 strings
+    (an index on it lets SQLite skip rows outside the range).
+    """
+    kind = "SQLite"
+
+    def __init__(self, path: str, filters: SourceFilters, table: Optional[str] = None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path) # sqlite3 would otherwise create an empty database
+        super().__init__(path, filters)
+        self.table = table or DEFAULT_TABLE
+
+    def _connect(self) -> sqlite3.Connection:
+        # Read-only; chunks are fetched from worker threads, one at a time
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _query(self, connection: sqlite3.Connection, limit: Optional[int] = None):
+        table = '"' + self.table.replace('"', '""') + '"'
+        available = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if not available:
+            raise ValueError(f"Table {self.table!r} not found in {self.path}")
+        columns = ", ".join(f'"{column}"' for column in self.filters.columns if column in available)
+        conditions, params = [], []
+        if limit is None:
+            if self.filters.start is not None:
+                conditions.append('"Date" >= ?')
+                params.append(str(self.filters.start.date()))
+            if self.filters.end_before is not None:
+                conditions.append('"Date" < ?')
+                params.append(str(self.filters.end_before.date()))
+            if self.filters.categories is not None:
+                conditions.append(f'"Product_Category" IN ({", ".join("?" * len(self.filters.categories))})')
+                params.extend(self.filters.categories)
+        sql = f"SELECT {columns} FROM {table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    def read(self) -> pd.DataFrame:
+        # A connection's context manager only ends the transaction; closing() closes it
+        with closing(self._connect()) as connection:
+            sql, params = self._query(connection)
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def iter_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        connection = self._connect()
+        try:
+            sql, params = self._query(connection)
+            yield from pd.read_sql_query(sql, connection, params=params, chunksize=chunk_rows)
+        finally:
+            connection.close()
+
+    def sample(self, rows: int) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            sql, params = self._query(connection, limit=rows)
+            return pd.read_sql_query(sql, connection, params=params)
+
+
+def _directory_format(path: str) -> Optional[str]:
+    for _, _, filenames in os.walk(path):
+        for filename in sorted(filenames):
+            file_format = COLUMNAR_FORMATS.get(os.path.splitext(filename)[1].lower())
+            if file_format:
+                return file_format
+    return None
+
+
+def is_partitioned_dataset(path: str) -> bool:
+    """A directory laid out as one hive-partitioned dataset (e.g. Product_Category=Gadgets/part-0.parquet)."""
+    return os.path.isdir(path) and any("=" in entry and os.path.isdir(os.path.join(path, entry))
+                                      for entry in os.listdir(path))
+
+
+def open_source(path: str, filters: Optional[SourceFilters] = None, table: Optional[str] = None) -> DataSource:
+    """The reader for `path`, chosen by extension; directories are read as Parquet/Feather datasets."""
+    filters = filters or SourceFilters()
+    if os.path.isdir(path):
+        file_format = _directory_format(path)
+        if file_format is None:
+            raise ValueError(f"No Parquet or Feather files found under {path}")
+        return ArrowSource(path, filters, file_format)
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in COLUMNAR_FORMATS:
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return ArrowSource(path, filters, COLUMNAR_FORMATS[suffix])
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteSource(path, filters, table)
+    return CsvSource(path, filters)
+
+
+def source_bytes(path: str) -> int:
+    """On-disk size of a source file or dataset directory."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path) for filename in filenames)
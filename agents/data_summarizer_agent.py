@@ -0,0 +1,173 @@
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.adk.agents.invocation_context import InvocationContext
+from google.genai.types import Content, Part # For creating proper content
+import asyncio # For running aggregation off the event loop
+import json # The digest is small, so it is kept in state as JSON
+import numpy as np
+import pandas as pd
+from typing import AsyncGenerator, Dict, Iterable, List, Optional
+from agents.aggregates import aggregate_frames, state_aggregates # Aggregates materialized by the preprocessor
+from agents.artifact_store import get_artifact_store, load_frame # Shared DataFrame handoff between stages
+from agents.checkpoint_store import get_checkpoint_store, record_stage, restore_stage, stage_status_text, version_of # Incremental runs
+from agents.tracing import record_metrics # Per-stage rows for the pipeline trace
+
+# Caps that keep the digest (and therefore every LLM prompt) bounded regardless of row count
+DEFAULT_TOP_N = 5
+DEFAULT_MAX_MONTHS = 24
+
+
+def _round(value: float) -> Optional[float]:
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def finalize_digest(agg: Dict[str, object], top_n: int = DEFAULT_TOP_N,
+                    max_months: int = DEFAULT_MAX_MONTHS) -> Dict[str, object]:
+    """Turn merged aggregates into a compact, JSON-serializable digest of bounded size."""
+    monthly = agg["monthly"].sort_index().tail(max_months)
+    monthly_pct = monthly['Revenue'].pct_change() * 100
+    products = agg["product"].sort_values('Revenue', ascending=False)
+    categories = agg["category"].sort_values('Revenue', ascending=False)
+
+    # Top movers: largest absolute revenue change between the two most recent months
+    movers = []
+    product_month = agg["product_month"].unstack(fill_value=0).sort_index(axis=1)
+    if product_month.shape[1] >= 2:
+        previous, latest = product_month.columns[-2], product_month.columns[-1]
+        change = product_month[latest] - product_month[previous]
+        for name in change.abs().sort_values(ascending=False).head(top_n).index:
+            movers.append({
+                "product": name,
+                "from_month": previous,
+                "to_month": latest,
+                "revenue_change": _round(change[name]),
+            })
+
+    count = agg["price_count"]
+    mean = agg["price_sum"] / count if count else np.nan
+    variance = agg["price_sumsq"] / count - mean ** 2 if count else np.nan
+
+    return {
+        "rows": int(agg["rows"]),
+        "date_range": [str(pd.Timestamp(agg["date_min"]).date()), str(pd.Timestamp(agg["date_max"]).date())],
+        "total_revenue": _round(agg["monthly"]['Revenue'].sum()),
+        "total_units": int(agg["monthly"]['Units_Sold'].sum()),
+        "monthly": [
+            {"month": row.Index, "revenue": _round(row.Revenue), "units": int(row.Units_Sold),
+             "revenue_pct_change": _round(monthly_pct[row.Index])}
+            for row in monthly.itertuples()
+        ],
+        "product_count": len(products),
+        "top_products": [
+            {"product": row.Index, "revenue": _round(row.Revenue), "units": int(row.Units_Sold)}
+            for row in products.head(top_n).itertuples()
+        ],
+        "category_count": len(categories),
+        "top_categories": [
+            {"category": row.Index, "revenue": _round(row.Revenue), "units": int(row.Units_Sold)}
+            for row in categories.head(top_n).itertuples()
+        ],
+        "unit_price": {
+            "mean": _round(mean),
+            "std": _round(np.sqrt(max(variance, 0.0)) if count else np.nan),
+            "min": _round(agg["price_min"]),
+            "max": _round(agg["price_max"]),
+        },
+        "top_movers": movers,
+    }
+
+
+def summarize_frames(frames: Iterable[pd.DataFrame], top_n: int = DEFAULT_TOP_N,
+                     max_months: int = DEFAULT_MAX_MONTHS) -> Dict[str, object]:
+    """Build the digest from one or more frames (chunks are folded in one at a time)."""
+    return finalize_digest(aggregate_frames(frames), top_n=top_n, max_months=max_months)
+
+
+def build_prompt_data(state, prompt_mode: str = "digest", sample_rows: int = 50) -> str:
+    """Return the data section for an analyst prompt.
+
+    "digest" (the default) uses the bounded digest from DataSummarizerAgent,
+    computing it on the spot if that stage did not run. "sample" embeds up to
+    `sample_rows` raw records instead and must be requested explicitly.
+    """
+    if prompt_mode == "sample":
+        df = load_frame(state["processed_data_ref"])
+        if len(df) > sample_rows:
+            df = df.sample(n=sample_rows, random_state=0).sort_index()
+        return "Sample of raw records (JSON):\n" + df.to_json(orient="records", date_format="iso")
+    if prompt_mode != "digest":
+        raise ValueError(f"Unknown prompt mode: {prompt_mode}")
+
+    digest_json = state.get("data_digest")
+    if not digest_json:
+        agg = state_aggregates(state)
+        if agg is not None:
+            digest_json = json.dumps(finalize_digest(agg))
+        else:
+            ref = state["processed_data_ref"]
+            refs = [ref] if isinstance(ref, str) else ref
+            store = get_artifact_store()
+            digest_json = json.dumps(summarize_frames(store.get(r) for r in refs))
+    return "Pre-aggregated summary of the full dataset (JSON):\n" + digest_json
+
+
+class DataSummarizerAgent(BaseAgent):
+    top_n: int = DEFAULT_TOP_N
+    max_months: int = DEFAULT_MAX_MONTHS
+
+    def __init__(self, name: str, top_n: int = DEFAULT_TOP_N, max_months: int = DEFAULT_MAX_MONTHS):
+        super().__init__(name=name)
+        object.__setattr__(self, 'top_n', top_n)
+        object.__setattr__(self, 'max_months', max_months)
+
+    @staticmethod
+    def _aggregate(state) -> Dict[str, object]:
+        """The preprocessor's materialized aggregates, or a fresh pass over the processed data without them."""
+        agg = state_aggregates(state)
+        if agg is not None:
+            return agg
+        store = get_artifact_store()
+        ref = state["processed_data_ref"]
+        refs: List[str] = [ref] if isinstance(ref, str) else ref
+        # Chunks are fetched lazily, so streamed data is never concatenated here
+        return aggregate_frames(store.get(r) for r in refs)
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        agent_name = self.name
+        print(f"[{agent_name}]: Summarizing processed data...")
+
+        processed_data_ref = ctx.session.state.get("processed_data_ref")
+        if not processed_data_ref:
+            error_msg = "Error: Processed data not found in state for summarization."
+            print(f"[{agent_name}]: {error_msg}")
+            content = Content(parts=[Part(text=error_msg)])
+            yield Event(content=content, author=agent_name, turn_complete=True)
+            return
+
+        state = ctx.session.state
+        try:
+            data_version = state.get("data_version")
+            input_version = version_of(data_version, self.top_n, self.max_months)
+            if data_version and restore_stage(state, agent_name, input_version):
+                print(f"[{agent_name}]: Inputs unchanged, reusing checkpointed digest")
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=True))])
+                yield Event(content=content, author=agent_name)
+                return
+
+            agg = await asyncio.to_thread(self._aggregate, state)
+            digest = finalize_digest(agg, top_n=self.top_n, max_months=self.max_months)
+            state["data_digest"] = json.dumps(digest)
+            print(f"[{agent_name}]: Summarized {digest['rows']} rows into a {len(state['data_digest'])}-byte digest")
+            record_metrics(rows_in=digest['rows'], digest_bytes=len(state['data_digest']))
+            content = Content(parts=[Part(text="Data summarization complete. Digest stored in state.")])
+            yield Event(content=content, author=agent_name)
+
+            if get_checkpoint_store() is not None and data_version:
+                record_stage(state, agent_name, input_version, ["data_digest"])
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
+        except Exception as e:
+            error_msg = f"Error during data summarization: {str(e)}"
+            print(f"[{agent_name}]: {error_msg}")
+            content = Content(parts=[Part(text=error_msg)])
+            yield Event(content=content, author=agent_name, turn_complete=True)
@@ -2,16 +2,81 @@ from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from google.adk.agents.invocation_context import InvocationContext
 from google.genai.types import Content, Part as GenAIPart # For creating proper content
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Union
+import json
 import os
-import google.generativeai as genai # Google AI Studio API
+from agents.data_summarizer_agent import DEFAULT_MAX_MONTHS, DEFAULT_TOP_N, build_prompt_data, finalize_digest # Bounded-size data section for prompts
+from agents.checkpoint_store import get_checkpoint_store, record_stage, restore_stage, stage_status_text, version_of # Incremental runs
+from agents.llm_cache import cached_generate # Shared persistent response cache
+from agents.llm_clients import call_with_retry, configure_gemini, gemini_generate # Pooled clients with retry/backoff
+from agents.map_reduce import MapReduceSettings, Partition, analyze_in_partitions # Partitioned analysis of large datasets
+from agents.tracing import record_metrics # Cache hits for the pipeline trace
+
+# Bump whenever the prompt template changes so cached responses are not reused
+PROMPT_VERSION = "1"
+
+TREND_FOCUS = """Focus specifically on:
+            1. Monthly revenue changes: Describe any significant increases or decreases.
+            2. Top-performing products: Identify products with high revenue or sales volume.
+            Provide a concise, bullet-pointed summary of your findings."""
+
+
+def trend_prompt(prompt_data: str) -> str:
+    return f"""You are an expert data analyst.
+            Analyze the following sales data to identify key trends.
+            {TREND_FOCUS}
+
+            Sales Data:
+            {prompt_data}
+
+            Your Analysis:
+            """
+
+
+def partition_trend_prompt(label: str, prompt_data: str) -> str:
+    return f"""You are an expert data analyst.
+            Analyze the following slice of a larger sales dataset ({label}) to identify key trends.
+            Other slices are analyzed separately, so report only what this slice shows.
+            {TREND_FOCUS}
+
+            Sales Data:
+            {prompt_data}
+
+            Your Analysis:
+            """
+
+
+def merge_trend_prompt(findings: List[Tuple[str, str]]) -> str:
+    partials = "\n\n".join(f"[{label}]\n{text}" for label, text in findings)
+    return f"""You are an expert data analyst.
+            The analyses below each cover one slice of the same sales dataset.
+            Merge them into a single analysis of the whole dataset, resolving overlaps
+            and highlighting patterns that span slices.
+            {TREND_FOCUS}
+
+            Partial Analyses:
+            {partials}
+
+            Your Analysis:
+            """
+
 
 class GeminiAnalystAgent(BaseAgent):
     model_name: str = "gemini-1.5-flash"  # Updated to valid model name
 
-    def __init__(self, name: str, model_name: str = "gemini-1.5-flash"):
+    prompt_mode: str = "digest"  # "digest" (bounded summary), "sample" (raw records) or "map_reduce" (per partition)
+    sample_rows: int = 50  # Records embedded when prompt_mode is "sample"
+    map_reduce: MapReduceSettings = MapReduceSettings()  # Partitioning when prompt_mode is "map_reduce"
+
+    def __init__(self, name: str, model_name: str = "gemini-1.5-flash", prompt_mode: str = "digest", sample_rows: int = 50,
+                 map_reduce: Union[MapReduceSettings, Dict[str, object], None] = None):
         super().__init__(name=name)
         object.__setattr__(self, 'model_name', model_name)
+        object.__setattr__(self, 'prompt_mode', prompt_mode)
+        object.__setattr__(self, 'sample_rows', sample_rows)
+        if isinstance(map_reduce, dict): # e.g. from the orchestrator, which does not import this module
+            map_reduce = MapReduceSettings(**map_reduce)
+        object.__setattr__(self, 'map_reduce', map_reduce or MapReduceSettings())
         
         # Check for Google AI API key
         api_key = os.getenv("GOOGLE_AI_API_KEY")
@@ -19,43 +84,85 @@ class GeminiAnalystAgent(BaseAgent):
             print(f"[{name}]: WARNING - GOOGLE_AI_API_KEY environment variable not set. Gemini calls may fail.")
         else:
             print(f"[{name}]: Google AI API key found (length: {len(api_key)})")
-            genai.configure(api_key=api_key)
+        configure_gemini(api_key)
+
+    async def _generate(self, prompt: str) -> str:
+        # Use Google AI Studio API through a cached model; the call never blocks the
+        # event loop, so other agents (e.g. a parallel OpenAI analyst) make progress meanwhile
+        return await gemini_generate(self.model_name, prompt)
+
+    async def _call_provider(self, prompt: str, deadline: Optional[float] = None) -> str:
+        # Rate limit, per-request timeout and backoff on transient errors, bounded by the pipeline deadline
+        return await call_with_retry("gemini", lambda: self._generate(prompt), deadline=deadline)
+
+    @staticmethod
+    def _partition_data(partition: Partition, partition_agg: Dict[str, object]) -> Optional[str]:
+        """Bounded digest of one partition's rows, from their aggregates."""
+        return json.dumps(finalize_digest(partition_agg, top_n=DEFAULT_TOP_N, max_months=DEFAULT_MAX_MONTHS))
 
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
         agent_name = self.name
         print(f"[{agent_name}]: Analyzing data with Google Gemini ({self.model_name})...")
 
-        processed_data_json = ctx.session.state.get("processed_data_json")
-        if not processed_data_json:
+        processed_data_ref = ctx.session.state.get("processed_data_ref")
+        if not processed_data_ref:
             error_msg = "Error: Processed data not found in state for Gemini analysis."
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[GenAIPart(text=error_msg)])
             yield Event(content=content, author=agent_name, turn_complete=True)
             return
 
-        prompt = f"""You are an expert data analyst.
-        Analyze the following sales data, provided in JSON format, to identify key trends.
-        Focus specifically on:
-        1. Monthly revenue changes: Describe any significant increases or decreases.
-        2. Top-performing products: Identify products with high revenue or sales volume.
-        Provide a concise, bullet-pointed summary of your findings.
-
-        Sales Data:
-        {processed_data_json}
+        # Skip the provider call entirely when the data and prompt settings are unchanged since the last run
+        data_version = ctx.session.state.get("data_version")
+        input_version = version_of(data_version, self.model_name, PROMPT_VERSION, self.prompt_mode, self.sample_rows,
+                                   *([self.map_reduce] if self.prompt_mode == "map_reduce" else []))
+        if data_version and restore_stage(ctx.session.state, agent_name, input_version):
+            print(f"[{agent_name}]: Inputs unchanged, reusing checkpointed analysis")
+            content = Content(parts=[GenAIPart(text=stage_status_text(agent_name, reused=True))])
+            yield Event(content=content, author=agent_name)
+            return
 
-        Your Analysis:
-        """
-        
         try:
-            # Use Google AI Studio API
-            model = genai.GenerativeModel(self.model_name)
-            response = model.generate_content(prompt)
-            analysis_text = response.text
+            # Absolute time.time() bound set by the orchestrator; retries never run past it
+            deadline = ctx.session.state.get("pipeline_deadline")
+
+            if self.prompt_mode == "map_reduce":
+                # Partitions are analyzed concurrently and merged in a final call; one event per partition
+                state = ctx.session.state
+                async for event in analyze_in_partitions(
+                    agent_name, state, self.map_reduce,
+                    self._partition_data,
+                    partition_trend_prompt, merge_trend_prompt,
+                    lambda stage, prompt, data: cached_generate(
+                        "gemini", self.model_name, f"{PROMPT_VERSION}-{stage}", data,
+                        lambda: self._call_provider(prompt, deadline)
+                    ),
+                    output_key="gemini_analysis"
+                ):
+                    yield event
+                analysis_text = state["gemini_analysis"]
+            else:
+                # The prompt carries the bounded digest by default, so its size does not grow with row count
+                prompt_data = build_prompt_data(ctx.session.state, self.prompt_mode, self.sample_rows)
+                prompt = trend_prompt(prompt_data)
+                analysis_text, cache_hit = await cached_generate(
+                    "gemini", self.model_name, PROMPT_VERSION, prompt_data,
+                    lambda: self._call_provider(prompt, deadline)
+                )
+                record_metrics(llm_cache_hit=cache_hit)
+                if cache_hit:
+                    print(f"[{agent_name}]: Reusing cached analysis for unchanged data")
+                ctx.session.state["gemini_analysis"] = analysis_text
             
             print(f"[{agent_name}]: Analysis completed: {analysis_text[:100]}...")
-            ctx.session.state["gemini_analysis"] = analysis_text
             content = Content(parts=[GenAIPart(text=f"Gemini analysis complete. Insights stored.")])
             yield Event(content=content, author=agent_name)
+            if get_checkpoint_store() is not None and data_version:
+                # Fallback text is never checkpointed, so a failed call is retried next run
+                keys = ["gemini_analysis"] + (["gemini_analysis_report"] if self.prompt_mode == "map_reduce" else [])
+                record_stage(ctx.session.state, agent_name, input_version, keys)
+                content = Content(parts=[GenAIPart(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
         except Exception as e:
             error_msg = f"Error during Gemini analysis: {str(e)}"
             print(f"[{agent_name}]: {error_msg}")
@@ -0,0 +1,40 @@
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.adk.agents.invocation_context import InvocationContext
+import asyncio # For importing the stage's module off the event loop
+import importlib
+from typing import Any, AsyncGenerator, Dict, Optional
+
+
+class LazyAgent(BaseAgent):
+    """Pipeline stage whose agent module is imported only when the stage first runs.
+
+    Building the pipeline therefore costs no pandas, matplotlib or provider SDK
+    imports; each stage pays for its own dependencies the first time it executes,
+    and the real agent is then reused by every later run and session.
+    """
+    target: str = "" # "package.module:ClassName" of the real agent
+    agent_kwargs: Dict[str, Any] = {} # Constructor arguments besides `name`
+
+    _agent: Optional[BaseAgent] = None
+
+    def __init__(self, name: str, target: str, **agent_kwargs: Any):
+        super().__init__(name=name)
+        object.__setattr__(self, 'target', target)
+        object.__setattr__(self, 'agent_kwargs', agent_kwargs)
+
+    def load(self) -> BaseAgent:
+        """Import and construct the real agent now (e.g. to warm up a long-running service)."""
+        if self._agent is None:
+            module_name, class_name = self.target.split(":")
+            agent_class = getattr(importlib.import_module(module_name), class_name)
+            self._agent = agent_class(name=self.name, **self.agent_kwargs)
+        return self._agent
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if self._agent is None:
+            # The import is the slow part; it runs in a worker thread so other sessions keep going
+            await asyncio.to_thread(importlib.import_module, self.target.split(":")[0])
+        agent = self.load()
+        async for event in agent._run_async_impl(ctx):
+            yield event
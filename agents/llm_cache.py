@@ -0,0 +1,153 @@
+import asyncio # Cache file I/O runs off the event loop
+import hashlib # For content-addressed cache keys
+import json
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "llm_responses")
+DEFAULT_MAX_MB = 100.0
+DEFAULT_TTL_SECONDS = 24 * 3600
+# Eviction frees space down to this share of max_mb, so a full cache is not rescanned on every write
+EVICT_TO_FRACTION = 0.9
+
+
+def fingerprint(text: str) -> str:
+    """Content hash of the data an analyst sends, used as part of the cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Persistent, content-addressed cache of LLM responses shared by the analyst agents.
+
+    Entries are keyed on (provider, model_name, prompt template version, data
+    fingerprint) and stored as one JSON file each under `root`. Expired entries
+    are dropped on read, and the least recently used entries are evicted once
+    the directory grows past `max_mb`. The directory size is tracked as entries
+    are written and only rescanned when it exceeds the cap (which also picks up
+    entries written by other processes). Another process may evict any file at
+    any time; a vanished entry is a miss.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB,
+                 ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.root = root
+        self.max_bytes = int(max_mb * 2**20)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size_bytes: Optional[int] = None # Running directory size; None until the first scan
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider: str, model_name: str, template_version: str, data_fingerprint: str) -> str:
+        raw = "\x1f".join([provider, model_name, template_version, data_fingerprint])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            try:
+                if self.ttl_seconds is not None and time.time() - entry["created_at"] > self.ttl_seconds:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    self._track(-size)
+                    self.misses += 1
+                    self.evictions += 1
+                    return None
+                # Touch the file so size-based eviction sees it as recently used
+                os.utime(path)
+            except OSError: # Evicted by another process in the meantime
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["response"]
+
+    def put(self, key: str, response: str, metadata: Optional[Dict[str, str]] = None) -> None:
+        path = self._path(key)
+        entry = {"created_at": time.time(), "response": response, "metadata": metadata or {}}
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path) # Atomic, so readers never see a partial entry
+            self._track(os.path.getsize(path) - replaced)
+            if self._size_bytes is None or self._size_bytes > self.max_bytes:
+                self._evict_to_size()
+
+    def _track(self, delta: int) -> None:
+        if self._size_bytes is not None:
+            self._size_bytes += delta
+
+    def _evict_to_size(self) -> None:
+        """Rescan the directory and remove the least recently used entries until it is back under the cap."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError: # Removed by another process during the scan
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        target = self.max_bytes if total <= self.max_bytes else int(self.max_bytes * EVICT_TO_FRACTION)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+        self._size_bytes = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# Process-wide cache shared by both analyst agents; the orchestrator may replace it
+_default_cache: Optional[LLMResponseCache] = LLMResponseCache()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    return _default_cache
+
+
+def set_llm_cache(cache: Optional[LLMResponseCache]) -> None:
+    """Install a cache, or pass None to disable response caching."""
+    global _default_cache
+    _default_cache = cache
+
+
+async def cached_generate(provider: str, model_name: str, template_version: str, data_text: str,
+                          generate: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+    """Return (response, cache_hit), calling `generate` only when no fresh entry exists."""
+    cache = get_llm_cache()
+    if cache is None:
+        return await generate(), False
+    key = cache.make_key(provider, model_name, template_version, fingerprint(data_text))
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        return cached, True
+    response = await generate()
+    await asyncio.to_thread(cache.put, key, response, {"provider": provider, "model_name": model_name})
+    return response, False
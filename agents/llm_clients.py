@@ -0,0 +1,155 @@
+import asyncio
+import os
+import random # For jittered backoff
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from agents.rate_limiter import acquire # Every attempt takes a slot from the provider's rate limit
+from agents.tracing import record_llm_call, record_llm_usage, start_llm_call # Latency and tokens for the pipeline trace
+
+# Connection pool shared by every OpenAI request in the process
+POOL_MAX_CONNECTIONS = 20
+POOL_MAX_KEEPALIVE = 10
+POOL_KEEPALIVE_EXPIRY_S = 60.0
+
+# Retry policy for transient provider errors
+DEFAULT_REQUEST_TIMEOUT_S = 30.0
+DEFAULT_MAX_ATTEMPTS = 4
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 8.0
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Transport/overload errors from the OpenAI and Google SDKs, matched by name so neither SDK is imported here
+RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "TooManyRequests", "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+    "ConnectError", "ReadTimeout", "RemoteProtocolError",
+}
+
+_openai_clients: Dict[Tuple[Optional[str], Optional[str], int], object] = {}
+_gemini_models: Dict[str, object] = {}
+_gemini_rest = False # The REST transport only offers a blocking generate_content
+
+
+def get_openai_client(api_key: Optional[str]):
+    """Return the pooled AsyncOpenAI client for this key, endpoint and event loop."""
+    import httpx
+    from openai import AsyncOpenAI
+
+    # Pooled connections belong to the loop that opened them, so the loop is part of the key
+    key = (api_key, os.getenv("OPENAI_BASE_URL"), id(asyncio.get_running_loop()))
+    client = _openai_clients.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=DEFAULT_REQUEST_TIMEOUT_S,
+        )
+        # Retries are handled by call_with_retry so that they respect pipeline deadlines
+        client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        _openai_clients[key] = client
+    return client
+
+
+def configure_gemini(api_key: Optional[str]) -> None:
+    """Configure the Gemini SDK once; GOOGLE_AI_API_ENDPOINT points it at another server (e.g. a stub)."""
+    import google.generativeai as genai
+    global _gemini_rest
+
+    endpoint = os.getenv("GOOGLE_AI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+        _gemini_rest = True
+    elif api_key:
+        genai.configure(api_key=api_key)
+    _gemini_models.clear() # Models hold the client of the previous configuration
+
+
+async def gemini_generate(model_name: str, prompt: str) -> str:
+    """Generate with a cached GenerativeModel, never blocking the event loop."""
+    import google.generativeai as genai
+
+    model = _gemini_models.get(model_name)
+    if model is None:
+        model = genai.GenerativeModel(model_name)
+        _gemini_models[model_name] = model
+    if _gemini_rest:
+        response = await asyncio.to_thread(model.generate_content, prompt)
+    else:
+        response = await model.generate_content_async(prompt)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        record_llm_usage(usage.prompt_token_count, usage.candidates_token_count)
+    return response.text
+
+
+async def close_clients() -> None:
+    """Close pooled connections; call once the pipeline (or batch) is done."""
+    for client in list(_openai_clients.values()):
+        await client.close()
+    _openai_clients.clear()
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Server-requested delay from a Retry-After header, if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def call_with_retry(provider: str, attempt: Callable[[], Awaitable[str]],
+                          deadline: Optional[float] = None,
+                          request_timeout: float = DEFAULT_REQUEST_TIMEOUT_S,
+                          max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+    """Run `attempt` with a per-request timeout, retrying transient errors with jittered backoff.
+
+    `deadline` is an absolute `time.time()` bound for the whole call (e.g. the
+    pipeline deadline): no rate-limit wait, attempt or backoff sleep is allowed
+    to run past it.
+    """
+    started = time.perf_counter()
+    start_llm_call()
+    for attempt_no in range(1, max_attempts + 1):
+        if deadline is None:
+            await acquire(provider)
+        else:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"Pipeline deadline reached before {provider} request could be sent")
+            try:
+                await asyncio.wait_for(acquire(provider), remaining)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Pipeline deadline reached while waiting for a rate-limit slot for {provider}") from None
+        timeout = request_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+            if timeout <= 0:
+                raise TimeoutError(f"Pipeline deadline reached before {provider} request could be sent")
+        try:
+            text = await asyncio.wait_for(attempt(), timeout)
+            record_llm_call(provider, time.perf_counter() - started, attempt_no)
+            return text
+        except Exception as e:
+            if deadline is not None and time.time() >= deadline:
+                raise TimeoutError(f"{provider} request did not finish before the pipeline deadline") from e
+            if attempt_no == max_attempts or not is_retryable(e):
+                raise
+            # Full jitter keeps concurrent sessions from retrying in lockstep
+            delay = _retry_after(e) or random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** (attempt_no - 1)))
+            if deadline is not None and time.time() + delay >= deadline:
+                raise
+            print(f"[{provider}]: Transient error ({type(e).__name__}), retry {attempt_no}/{max_attempts - 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,243 @@
+from google.adk.events import Event
+from google.genai.types import Content, Part # For creating proper content
+from dataclasses import dataclass
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio # Partition calls run concurrently under a semaphore
+import json
+import time
+import pandas as pd
+from agents.aggregates import aggregate_frames, frames_in_range, merge_aggregates, partial_aggregates, state_aggregates # Date index and per-partition totals
+from agents.artifact_store import get_artifact_store # Shared DataFrame handoff between stages
+from agents.tracing import count_llm_tokens, record_metrics # Tokens and partition counts for the pipeline trace
+
+PARTITION_BY = ("month", "product")
+
+
+@dataclass(frozen=True)
+class MapReduceSettings:
+    """How an analyst splits the data when it runs in `prompt_mode="map_reduce"`."""
+    partition_by: str = "month" # "month" (time windows) or "product"
+    partition_size: int = 3 # Months per window, or products per partition
+    max_parallel: int = 4 # Partition calls in flight at once
+    token_budget: int = 50_000 # Estimated prompt + completion tokens for all calls of one analysis
+    max_output_tokens: int = 500 # Completion tokens reserved per call in the estimate
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English and JSON); used before any call is made."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Partition:
+    """One slice of the processed data: a window of months or a group of products."""
+    label: str
+    start: Optional[pd.Timestamp] = None
+    end: Optional[pd.Timestamp] = None
+    products: Optional[List[str]] = None
+
+    def select(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The rows of `df` (processed data, or e.g. flagged anomalies) that fall in this partition."""
+        if self.products is not None:
+            return df[df['Product_Name'].isin(self.products)]
+        return df[(df['Date'] >= self.start) & (df['Date'] <= self.end)]
+
+    def merge(self, other: "Partition") -> "Partition":
+        """This partition and the next one as a single partition, as planned with twice the size."""
+        if self.products is not None:
+            products = self.products + other.products
+            return Partition(label=", ".join(products), products=products)
+        return Partition(label=f"{self.start.to_period('M')}..{other.end.to_period('M')}",
+                         start=self.start, end=other.end)
+
+
+def plan_partitions(agg: Dict[str, object], partition_by: str, partition_size: int) -> List[Partition]:
+    """Consecutive `partition_size`-month windows, or groups of `partition_size` products by revenue."""
+    if partition_by not in PARTITION_BY:
+        raise ValueError(f"Unknown partition_by: {partition_by} (expected one of {', '.join(PARTITION_BY)})")
+    size = max(1, partition_size)
+    if partition_by == "product":
+        products = list(agg["product"].sort_values('Revenue', ascending=False).index)
+        return [Partition(label=", ".join(products[i:i + size]), products=products[i:i + size])
+                for i in range(0, len(products), size)]
+    months = pd.period_range(pd.Timestamp(agg["date_min"]).to_period('M'),
+                             pd.Timestamp(agg["date_max"]).to_period('M'), freq='M')
+    partitions = []
+    for i in range(0, len(months), size):
+        window = months[i:i + size]
+        label = str(window[0]) if len(window) == 1 else f"{window[0]}..{window[-1]}"
+        partitions.append(Partition(label=label, start=window[0].start_time, end=window[-1].end_time))
+    return partitions
+
+
+def partition_aggregates(state, agg: Dict[str, object],
+                         partitions: List[Partition]) -> List[Optional[Dict[str, object]]]:
+    """Aggregates of each partition's rows (None if it has none), reading the processed data once.
+
+    Time windows read only the chunks whose date range overlaps, through the
+    date index in `agg`; product groups are split out of each chunk in one pass.
+    """
+    ref = state["processed_data_ref"]
+    aggregates: List[Optional[Dict[str, object]]] = [None] * len(partitions)
+    if partitions[0].products is None:
+        for i, partition in enumerate(partitions):
+            frames = [frame for frame in frames_in_range(ref, agg, partition.start, partition.end) if len(frame)]
+            aggregates[i] = aggregate_frames(frames) if frames else None
+        return aggregates
+    index = {product: i for i, partition in enumerate(partitions) for product in partition.products}
+    store = get_artifact_store()
+    for handle in ([ref] if isinstance(ref, str) else ref):
+        df = store.get(handle)
+        for i, rows in df.groupby(df['Product_Name'].map(index), sort=False):
+            i = int(i)
+            partial = partial_aggregates(rows)
+            aggregates[i] = partial if aggregates[i] is None else merge_aggregates(aggregates[i], partial)
+    return aggregates
+
+
+def _merge_neighbours(partitions: List[Partition], aggregates: List[Optional[Dict[str, object]]]
+                      ) -> Tuple[List[Partition], List[Optional[Dict[str, object]]]]:
+    """Merge consecutive pairs of partitions and their aggregates, doubling the partition size."""
+    merged_partitions, merged_aggregates = [], []
+    for i in range(0, len(partitions), 2):
+        pair = partitions[i:i + 2]
+        merged_partitions.append(pair[0] if len(pair) == 1 else pair[0].merge(pair[1]))
+        present = [agg for agg in aggregates[i:i + 2] if agg is not None]
+        merged_aggregates.append(merge_aggregates(*present) if len(present) == 2 else (present or [None])[0])
+    return merged_partitions, merged_aggregates
+
+
+def plan_within_budget(state, settings: MapReduceSettings,
+                       partition_data: Callable[[Partition, Dict[str, object]], Optional[str]],
+                       map_prompt: Callable[[str, str], str], reduce_overhead: int
+                       ) -> Tuple[List[Tuple[str, str]], int, int]:
+    """Partition the data and render each partition's prompt data, fitting the whole run into the token budget.
+
+    `partition_data(partition, partition_agg)` renders one partition from the
+    aggregates of its rows, which are computed once (see `partition_aggregates`).
+    Partitions are then doubled in size, by merging neighbouring aggregates,
+    until the estimated tokens of every map call plus the reduce call fit
+    `settings.token_budget`. Partitions without rows, or whose data is None,
+    are skipped. Returns the (label, data) pairs, the partition size used and
+    the estimated total tokens.
+    """
+    agg = state_aggregates(state)
+    if agg is None:
+        ref = state["processed_data_ref"]
+        store = get_artifact_store()
+        agg = aggregate_frames(store.get(handle) for handle in ([ref] if isinstance(ref, str) else ref))
+    size = max(1, settings.partition_size)
+    partitions = plan_partitions(agg, settings.partition_by, size)
+    aggregates = partition_aggregates(state, agg, partitions)
+    while True:
+        parts = [(p.label, data) for p, part_agg in zip(partitions, aggregates) if part_agg is not None
+                 for data in [partition_data(p, part_agg)] if data is not None]
+        map_tokens = sum(estimate_tokens(map_prompt(label, data)) + settings.max_output_tokens for label, data in parts)
+        # The reduce prompt carries every partial finding, each at most max_output_tokens long
+        reduce_tokens = reduce_overhead + (len(parts) + 1) * settings.max_output_tokens
+        estimate = map_tokens + reduce_tokens
+        if estimate <= settings.token_budget:
+            return parts, size, estimate
+        if len(parts) <= 1:
+            raise ValueError(f"Token budget of {settings.token_budget} is too small: "
+                             f"a single partition needs about {estimate} tokens")
+        size *= 2
+        partitions, aggregates = _merge_neighbours(partitions, aggregates)
+
+
+async def run_map_reduce(parts: List[Tuple[str, str]], settings: MapReduceSettings,
+                         map_prompt: Callable[[str, str], str],
+                         reduce_prompt: Callable[[List[Tuple[str, str]]], str],
+                         generate: Callable[[str, str, str], Awaitable[Tuple[str, bool]]]
+                         ) -> AsyncGenerator[Dict[str, object], None]:
+    """Analyze partitions concurrently, then merge their findings in one reduce call.
+
+    `generate(stage, prompt, data_text)` performs one (cached, retried) provider
+    call. Yields a `partition` progress dict as each map call finishes, then a
+    final `reduce` dict with the merged analysis and a report of calls, tokens
+    and wall time.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, settings.max_parallel))
+
+    async def analyze(index: int, label: str, data: str) -> Dict[str, object]:
+        async with semaphore:
+            # Runs as its own task, so these totals only count this partition's call
+            tokens = count_llm_tokens()
+            call_started = time.perf_counter()
+            try:
+                text, cache_hit = await generate("map", map_prompt(label, data), f"{label}\n{data}")
+                error = None
+            except Exception as e:
+                text, cache_hit, error = None, False, str(e) or type(e).__name__
+            return {"event": "partition", "index": index, "label": label, "findings": text, "error": error,
+                    "cache_hit": cache_hit, "seconds": round(time.perf_counter() - call_started, 4), **tokens}
+
+    tasks = [asyncio.create_task(analyze(i, label, data)) for i, (label, data) in enumerate(parts)]
+    results: List[Dict[str, object]] = []
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            result = await task
+            results.append(result)
+            yield {**result, "done": done, "total": len(parts)}
+    finally:
+        for task in tasks:
+            task.cancel()
+    map_wall = time.perf_counter() - started
+
+    findings = [(r["label"], r["findings"]) for r in sorted(results, key=lambda r: r["index"]) if r["error"] is None]
+    if not findings:
+        raise RuntimeError(f"All {len(parts)} partitions failed; first error: {results[0]['error']}")
+    tokens = count_llm_tokens()
+    reduce_started = time.perf_counter()
+    reduce_data = "\n\n".join(f"[{label}]\n{text}" for label, text in findings)
+    analysis, reduce_cache_hit = await generate("reduce", reduce_prompt(findings), reduce_data)
+
+    report = {
+        "partitions": len(parts),
+        "failed_partitions": len(parts) - len(findings),
+        "cache_hits": sum(r["cache_hit"] for r in results) + int(reduce_cache_hit),
+        "max_parallel": settings.max_parallel,
+        "prompt_tokens": sum(r["prompt_tokens"] for r in results) + tokens["prompt_tokens"],
+        "completion_tokens": sum(r["completion_tokens"] for r in results) + tokens["completion_tokens"],
+        "map_wall_s": round(map_wall, 4),
+        "reduce_wall_s": round(time.perf_counter() - reduce_started, 4),
+        "wall_s": round(time.perf_counter() - started, 4),
+    }
+    record_metrics(map_partitions=report["partitions"], map_failed=report["failed_partitions"],
+                   map_wall_s=report["map_wall_s"], reduce_wall_s=report["reduce_wall_s"])
+    yield {"event": "reduce", "analysis": analysis, "report": report}
+
+
+async def analyze_in_partitions(agent_name: str, state, settings: MapReduceSettings,
+                                partition_data: Callable[[Partition, Dict[str, object]], Optional[str]],
+                                map_prompt: Callable[[str, str], str],
+                                reduce_prompt: Callable[[List[Tuple[str, str]]], str],
+                                generate: Callable[[str, str, str], Awaitable[Tuple[str, bool]]],
+                                output_key: str) -> AsyncGenerator[Event, None]:
+    """Map-reduce analysis for an analyst agent, streaming one event per partition.
+
+    The merged analysis is stored in `state[output_key]` and the run's report
+    (partitions, tokens, wall time) as JSON in `state[output_key + "_report"]`.
+    """
+    parts, size, estimate = await asyncio.to_thread(
+        plan_within_budget, state, settings, partition_data, map_prompt, estimate_tokens(reduce_prompt([]))
+    )
+    print(f"[{agent_name}]: Map-reduce over {len(parts)} partitions by {settings.partition_by} "
+          f"(size {size}, ~{estimate} tokens estimated, {settings.max_parallel} in parallel)")
+    async for progress in run_map_reduce(parts, settings, map_prompt, reduce_prompt, generate):
+        if progress["event"] == "partition":
+            outcome = f"failed: {progress['error']}" if progress["error"] else f"analyzed in {progress['seconds']:.2f}s"
+            text = f"Partition {progress['done']}/{progress['total']} ({progress['label']}) {outcome}"
+            print(f"[{agent_name}]: {text}")
+            yield Event(content=Content(parts=[Part(text=text)]), author=agent_name)
+            continue
+        report = {**progress["report"], "partition_by": settings.partition_by, "partition_size": size,
+                  "estimated_tokens": estimate}
+        state[output_key] = progress["analysis"]
+        state[f"{output_key}_report"] = json.dumps(report)
+        text = (f"Merged {report['partitions'] - report['failed_partitions']}/{report['partitions']} partition analyses: "
+                f"{report['prompt_tokens'] + report['completion_tokens']} tokens, {report['wall_s']:.2f}s "
+                f"({report['map_wall_s']:.2f}s map, {report['reduce_wall_s']:.2f}s reduce)")
+        print(f"[{agent_name}]: {text}")
+        yield Event(content=Content(parts=[Part(text=text)]), author=agent_name)
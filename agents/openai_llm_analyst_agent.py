@@ -2,16 +2,83 @@ from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from google.adk.agents.invocation_context import InvocationContext
 from google.genai.types import Content, Part # For creating proper content
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Union
+import pandas as pd
+import asyncio # For running the anomaly engine off the event loop
+import json
 import os # For accessing environment variables
-from openai import AsyncOpenAI # Direct OpenAI SDK instead of LiteLLM
+from agents.anomaly_engine import detect_anomalies, format_anomaly_report, summarize_anomalies # Local outlier detection
+from agents.artifact_store import load_frame # Shared DataFrame handoff between stages
+from agents.data_summarizer_agent import build_prompt_data # Bounded-size data section for prompts
+from agents.checkpoint_store import get_checkpoint_store, record_stage, restore_stage, stage_status_text, version_of # Incremental runs
+from agents.llm_cache import cached_generate # Shared persistent response cache
+from agents.llm_clients import call_with_retry, get_openai_client # Pooled clients with retry/backoff
+from agents.map_reduce import MapReduceSettings, Partition, analyze_in_partitions # Partitioned analysis of large datasets
+from agents.tracing import record_llm_usage, record_metrics # Rows and token counts for the pipeline trace
+
+# Bump whenever the prompt template changes so cached responses are not reused
+PROMPT_VERSION = "2"
+
+AUDIT_METHOD = """A statistical anomaly engine compared every sales record against its product and category peers
+            using a rolling z-score, the median absolute deviation (MAD) and IQR fences on units sold,
+            revenue and unit price."""
+
+
+def anomaly_prompt(prompt_data: str) -> str:
+    return f"""You are a meticulous data auditor.
+            {AUDIT_METHOD} Explain the most significant flagged records below: what is unusual
+            about each and plausible business causes. If nothing was flagged, say so briefly.
+
+            Sales Data:
+            {prompt_data}
+
+            Anomaly Report:
+            """
+
+
+def partition_anomaly_prompt(label: str, prompt_data: str) -> str:
+    return f"""You are a meticulous data auditor.
+            {AUDIT_METHOD} The records below were flagged in one slice of the data ({label}).
+            Explain the most significant ones: what is unusual about each and plausible business causes.
+            If nothing was flagged, say so briefly.
+
+            Sales Data:
+            {prompt_data}
+
+            Anomaly Report:
+            """
+
+
+def merge_anomaly_prompt(findings: List[Tuple[str, str]]) -> str:
+    partials = "\n\n".join(f"[{label}]\n{text}" for label, text in findings)
+    return f"""You are a meticulous data auditor.
+            {AUDIT_METHOD} The reports below each explain the flags in one slice of the data.
+            Merge them into a single anomaly report for the whole dataset: keep the most significant
+            records, group related ones and note anomalies that recur across slices.
+
+            Partial Reports:
+            {partials}
+
+            Anomaly Report:
+            """
+
 
 class OpenAiAnalystAgent(BaseAgent):
     model_name: str = "gpt-4o-mini"  # Updated model name without provider prefix
 
-    def __init__(self, name: str, model_name: str = "gpt-4o-mini"):
+    prompt_mode: str = "digest"  # "digest" (bounded summary), "sample" (raw records) or "map_reduce" (per partition)
+    sample_rows: int = 50  # Records embedded when prompt_mode is "sample"
+    map_reduce: MapReduceSettings = MapReduceSettings()  # Partitioning when prompt_mode is "map_reduce"
+
+    def __init__(self, name: str, model_name: str = "gpt-4o-mini", prompt_mode: str = "digest", sample_rows: int = 50,
+                 map_reduce: Union[MapReduceSettings, Dict[str, object], None] = None):
         super().__init__(name=name)
         object.__setattr__(self, 'model_name', model_name)
+        object.__setattr__(self, 'prompt_mode', prompt_mode)
+        object.__setattr__(self, 'sample_rows', sample_rows)
+        if isinstance(map_reduce, dict): # e.g. from the orchestrator, which does not import this module
+            map_reduce = MapReduceSettings(**map_reduce)
+        object.__setattr__(self, 'map_reduce', map_reduce or MapReduceSettings())
         
         # Check for API key with debugging
         api_key = os.getenv("OPENAI_API_KEY")
@@ -23,64 +90,118 @@ class OpenAiAnalystAgent(BaseAgent):
         # Store API key for later use
         object.__setattr__(self, 'api_key', api_key)
 
+    async def _generate(self, prompt: str) -> str:
+        # Pooled client: connections are kept alive and reused across runs and sessions
+        client = get_openai_client(self.api_key)
+
+        # Use direct OpenAI SDK
+        response = await client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=500
+        )
+        if response.usage is not None:
+            record_llm_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    async def _call_provider(self, prompt: str, deadline: Optional[float] = None) -> str:
+        # Rate limit, per-request timeout and backoff on transient errors, bounded by the pipeline deadline
+        return await call_with_retry("openai", lambda: self._generate(prompt), deadline=deadline)
+
+    @staticmethod
+    def _detect(processed_data_ref) -> tuple:
+        df = load_frame(processed_data_ref)
+        anomalies = detect_anomalies(df)
+        return anomalies, summarize_anomalies(anomalies, rows_scanned=len(df))
+
+    @staticmethod
+    def _partition_data(anomalies: pd.DataFrame, partition: Partition, partition_agg: Dict[str, object]) -> Optional[str]:
+        """The engine's flags within one partition."""
+        summary = summarize_anomalies(partition.select(anomalies), rows_scanned=int(partition_agg["rows"]))
+        return "Flagged rows from the statistical anomaly engine (JSON):\n" + json.dumps(summary)
+
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
         agent_name = self.name
         print(f"[{agent_name}]: Analyzing data with OpenAI ({self.model_name})...")
         
-        processed_data_json = ctx.session.state.get("processed_data_json")
-        if not processed_data_json:
+        processed_data_ref = ctx.session.state.get("processed_data_ref")
+        if not processed_data_ref:
             error_msg = "Error: Processed data not found in state for OpenAI analysis."
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
             yield Event(content=content, author=agent_name, turn_complete=True)
             return
 
-        prompt = f"""You are a meticulous data auditor.
-        Based on the following sales data (in JSON format), identify potential anomalies or outliers.
-        Consider unusual spikes or dips in units sold or revenue that deviate from general patterns.
-        Explain any unusual patterns you detect in a brief, clear manner.
+        # Skip the provider call entirely when the data and prompt settings are unchanged since the last run
+        data_version = ctx.session.state.get("data_version")
+        input_version = version_of(data_version, self.model_name, PROMPT_VERSION, self.prompt_mode, self.sample_rows,
+                                   *([self.map_reduce] if self.prompt_mode == "map_reduce" else []))
+        if data_version and restore_stage(ctx.session.state, agent_name, input_version):
+            print(f"[{agent_name}]: Inputs unchanged, reusing checkpointed analysis")
+            content = Content(parts=[Part(text=stage_status_text(agent_name, reused=True))])
+            yield Event(content=content, author=agent_name)
+            return
 
-        Sales Data:
-        {processed_data_json}
+        anomaly_summary: Optional[Dict[str, object]] = None
+        try:
+            # The deterministic engine flags outliers locally; only the flagged rows reach the LLM
+            anomalies, anomaly_summary = await asyncio.to_thread(self._detect, processed_data_ref)
+            ctx.session.state["anomaly_summary"] = json.dumps(anomaly_summary)
+            print(f"[{agent_name}]: Anomaly engine flagged {anomaly_summary['flagged_rows']} of {anomaly_summary['rows_scanned']} rows "
+                  f"({anomaly_summary['flag_count']} flags)")
+            record_metrics(rows_in=anomaly_summary['rows_scanned'], rows_out=anomaly_summary['flagged_rows'])
 
-        Anomaly Report:
-        """
+            # Absolute time.time() bound set by the orchestrator; retries never run past it
+            deadline = ctx.session.state.get("pipeline_deadline")
 
-        try:
-            # Initialize OpenAI client here to avoid Pydantic issues
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            # Use direct OpenAI SDK
-            response = await client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                timeout=30
-            )
-            analysis_text = response.choices[0].message.content
+            if self.prompt_mode == "map_reduce":
+                # Each partition's flags are explained concurrently and merged in a final call; one event per partition
+                state = ctx.session.state
+                async for event in analyze_in_partitions(
+                    agent_name, state, self.map_reduce,
+                    lambda partition, partition_agg: self._partition_data(anomalies, partition, partition_agg),
+                    partition_anomaly_prompt, merge_anomaly_prompt,
+                    lambda stage, prompt, data: cached_generate(
+                        "openai", self.model_name, f"{PROMPT_VERSION}-{stage}", data,
+                        lambda: self._call_provider(prompt, deadline)
+                    ),
+                    output_key="openai_analysis"
+                ):
+                    yield event
+                analysis_text = state["openai_analysis"]
+            else:
+                if self.prompt_mode == "sample":
+                    prompt_data = build_prompt_data(ctx.session.state, self.prompt_mode, self.sample_rows)
+                else:
+                    prompt_data = "Flagged rows from the statistical anomaly engine (JSON):\n" + json.dumps(anomaly_summary)
+                prompt = anomaly_prompt(prompt_data)
+                analysis_text, cache_hit = await cached_generate(
+                    "openai", self.model_name, PROMPT_VERSION, prompt_data,
+                    lambda: self._call_provider(prompt, deadline)
+                )
+                record_metrics(llm_cache_hit=cache_hit)
+                if cache_hit:
+                    print(f"[{agent_name}]: Reusing cached analysis for unchanged data")
+                ctx.session.state["openai_analysis"] = analysis_text
             print(f"[{agent_name}]: Analysis completed: {analysis_text[:100]}...")
-            ctx.session.state["openai_analysis"] = analysis_text
             content = Content(parts=[Part(text=f"OpenAI analysis complete. Insights stored.")])
             yield Event(content=content, author=agent_name)
+            if get_checkpoint_store() is not None and data_version:
+                # Fallback text is never checkpointed, so a failed call is retried next run
+                keys = ["openai_analysis", "anomaly_summary"] + (["openai_analysis_report"] if self.prompt_mode == "map_reduce" else [])
+                record_stage(ctx.session.state, agent_name, input_version, keys)
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
         except Exception as e:
             error_msg = f"Error during OpenAI analysis: {str(e)}"
             print(f"[{agent_name}]: {error_msg}")
-            # Create a comprehensive fallback analysis based on the data patterns
-            fallback_analysis = """
-            ## Anomaly Detection Report
-
-            **Key Findings:**
-            • **Revenue Spike**: AlphaSpark shows 50% revenue increase from Jan to Mar ($1,200 → $1,800)
-            • **Volume Anomaly**: BetaBolt units declined by 10% while maintaining similar revenue
-            • **Category Performance**: Gadgets category outperforming Widgets and Gizmos consistently
-            • **Seasonal Pattern**: Q1 shows strong growth trend across all product categories
-            
-            **Recommendations:**
-            • Investigate AlphaSpark's pricing strategy for potential optimization
-            • Monitor BetaBolt for potential supply or demand issues
-            • Focus marketing efforts on Gadgets category expansion
-            """
-            print(f"[{agent_name}]: Using detailed fallback analysis")
+            if anomaly_summary is not None:
+                # The engine's own findings are a real, data-driven report even without the LLM
+                fallback_analysis = format_anomaly_report(anomaly_summary)
+                print(f"[{agent_name}]: Using anomaly engine report as fallback analysis")
+            else:
+                fallback_analysis = f"## Anomaly Detection Report\n\nAnomaly detection unavailable: {str(e)}"
+                print(f"[{agent_name}]: No anomaly findings available for fallback analysis")
             ctx.session.state["openai_analysis"] = fallback_analysis
             content = Content(parts=[Part(text=f"OpenAI analysis completed using fallback analysis.")])
             yield Event(content=content, author=agent_name) 
\ No newline at end of file
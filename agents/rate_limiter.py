@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Async token bucket: allows `rate_per_minute` requests with bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock() # Waiters are served in arrival order
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+# Per-provider limits shared by every session in the process; unset providers are unlimited
+_limiters: Dict[str, TokenBucket] = {}
+
+
+def set_rate_limit(provider: str, bucket: Optional[TokenBucket]) -> None:
+    if bucket is None:
+        _limiters.pop(provider, None)
+    else:
+        _limiters[provider] = bucket
+
+
+async def acquire(provider: str) -> None:
+    """Wait for a request slot for `provider`, if a limit is configured."""
+    bucket = _limiters.get(provider)
+    if bucket is not None:
+        await bucket.acquire()
@@ -0,0 +1,211 @@
+import asyncio
+import contextvars # The active span follows each agent's task, including parallel branches
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water mark of this process's resident memory, in MiB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError: # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in KiB on Linux and in bytes on macOS
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+
+
+def state_bytes(state) -> int:
+    """Serialized size of a session's state."""
+    return len(json.dumps(dict(state), default=str).encode("utf-8"))
+
+
+def attach_callbacks(agent, before: Optional[Callable] = None, after: Optional[Callable] = None) -> None:
+    """Add before/after callbacks to an agent and all of its sub-agents, keeping existing ones."""
+    for field, callback in (("before_agent_callback", before), ("after_agent_callback", after)):
+        if callback is None:
+            continue
+        existing = getattr(agent, field)
+        callbacks = [] if existing is None else (list(existing) if isinstance(existing, list) else [existing])
+        object.__setattr__(agent, field, callbacks + [callback])
+    for sub_agent in agent.sub_agents:
+        attach_callbacks(sub_agent, before, after)
+
+
+class Span:
+    """Measurements for one agent run in one session."""
+
+    def __init__(self, tracer: "PipelineTracer", session_id: str, agent: str, parent: Optional["Span"]):
+        self.tracer = tracer
+        self.session_id = session_id
+        self.agent = agent
+        self.parent = parent
+        self.lane = tracer._lane() # Parallel branches get their own row in the trace viewer
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._cpu = time.process_time()
+        self._rss = peak_rss_mb()
+        self.metrics: Dict[str, object] = {}
+        self.llm_calls: List[Dict[str, object]] = []
+
+    def finish(self, state) -> Dict[str, object]:
+        rss = peak_rss_mb()
+        record = {
+            "session": self.session_id,
+            "agent": self.agent,
+            "parent": self.parent.agent if self.parent else None,
+            "start": self.start,
+            "wall_s": round(time.perf_counter() - self._started, 6),
+            # Process-wide: includes worker threads, and any agents running concurrently
+            "cpu_s": round(time.process_time() - self._cpu, 6),
+            "peak_rss_delta_mb": round(rss - self._rss, 1) if rss is not None else None,
+            "state_bytes": state_bytes(state),
+            **self.metrics,
+        }
+        if self.llm_calls:
+            record.update(
+                llm_calls=len(self.llm_calls),
+                llm_latency_s=round(sum(call["latency_s"] for call in self.llm_calls), 6),
+                llm_prompt_tokens=sum(call.get("prompt_tokens") or 0 for call in self.llm_calls),
+                llm_completion_tokens=sum(call.get("completion_tokens") or 0 for call in self.llm_calls),
+            )
+        return record
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("mas_current_span", default=None)
+# Per task, so concurrent provider calls of one agent (e.g. map-reduce partitions) keep their own token counts
+_call_usage: contextvars.ContextVar[Optional[Dict[str, Optional[int]]]] = contextvars.ContextVar("mas_call_usage", default=None)
+_token_totals: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("mas_token_totals", default=None)
+
+
+def record_metrics(**metrics: object) -> None:
+    """Attach metrics (e.g. rows_in, rows_out) to the running agent's span; a no-op when not tracing."""
+    span = _current_span.get()
+    if span is not None:
+        span.metrics.update(metrics)
+
+
+def start_llm_call() -> None:
+    """Begin a provider call in the current task; `record_llm_usage` fills in its tokens."""
+    _call_usage.set({})
+
+
+def record_llm_call(provider: str, latency_s: float, attempts: int = 1) -> None:
+    """Record a completed provider call (latency across all attempts) on the running agent's span."""
+    span = _current_span.get()
+    if span is not None:
+        call = {"provider": provider, "end": time.time(), "latency_s": round(latency_s, 6), "attempts": attempts}
+        call.update(_call_usage.get() or {})
+        span.llm_calls.append(call)
+        span.tracer._emit({"event": "llm_call", "session": span.session_id, "agent": span.agent, **call})
+
+
+def record_llm_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """Token counts reported by the provider for the call in progress."""
+    usage = _call_usage.get()
+    if usage is not None:
+        usage.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    totals = _token_totals.get()
+    if totals is not None:
+        totals["prompt_tokens"] += prompt_tokens or 0
+        totals["completion_tokens"] += completion_tokens or 0
+
+
+def count_llm_tokens() -> Dict[str, int]:
+    """Start totalling provider-reported tokens for the current task; returns the running totals."""
+    totals = {"prompt_tokens": 0, "completion_tokens": 0}
+    _token_totals.set(totals)
+    return totals
+
+
+class PipelineTracer:
+    """Wraps every agent of a pipeline with spans and turns them into structured events and traces.
+
+    Each agent run yields an `agent_start` and an `agent_end` event (wall and CPU
+    time, peak memory growth, serialized state size, rows in/out and LLM tokens
+    and latency), and each provider call an `llm_call` event. Listeners receive
+    events as they happen; `export_chrome_trace` writes a file that chrome://tracing
+    or https://ui.perfetto.dev can open.
+    """
+
+    def __init__(self, listeners: Optional[List[Callable[[Dict[str, object]], None]]] = None):
+        self.listeners = list(listeners or [])
+        self.events: List[Dict[str, object]] = []
+        self.spans: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+        self._lanes: Dict[int, int] = {}
+
+    def attach(self, agent) -> None:
+        attach_callbacks(agent, self.before, self.after)
+
+    def _lane(self) -> int:
+        task = asyncio.current_task()
+        key = id(task) if task is not None else 0
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def _emit(self, event: Dict[str, object]) -> None:
+        with self._lock:
+            self.events.append(event)
+        for listener in self.listeners:
+            listener(event)
+
+    def before(self, callback_context):
+        span = Span(self, callback_context.session.id, callback_context.agent_name, _current_span.get())
+        _current_span.set(span)
+        self._emit({"event": "agent_start", "session": span.session_id, "agent": span.agent, "start": span.start})
+        return None
+
+    def after(self, callback_context):
+        span = _current_span.get()
+        if span is None or span.agent != callback_context.agent_name:
+            return None
+        record = span.finish(callback_context.session.state)
+        record["lane"] = span.lane
+        record["llm"] = span.llm_calls
+        _current_span.set(span.parent)
+        with self._lock:
+            self.spans.append(record)
+        self._emit({"event": "agent_end", **{k: v for k, v in record.items() if k not in ("lane", "llm")}})
+        return None
+
+    def summary(self) -> str:
+        """Per-agent table of the recorded spans, in completion order."""
+        lines = [f"{'agent':<24}{'wall s':>9}{'cpu s':>9}{'Δpeak MiB':>11}{'state B':>10}{'rows in':>11}{'rows out':>11}{'tokens':>8}"]
+        for span in self.spans:
+            tokens = (span.get("llm_prompt_tokens") or 0) + (span.get("llm_completion_tokens") or 0)
+            lines.append(
+                f"{span['agent']:<24}{span['wall_s']:>9.3f}{span['cpu_s']:>9.3f}{span['peak_rss_delta_mb'] or 0:>11.1f}"
+                f"{span['state_bytes']:>10,}{span.get('rows_in', ''):>11}{span.get('rows_out', ''):>11}{tokens or '':>8}"
+            )
+        return "\n".join(lines)
+
+    def export_events(self, path: str) -> None:
+        """Write every structured event as one JSON object per line."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write the spans in Chrome trace event format: one process per session, one thread per branch."""
+        sessions = {session: pid for pid, session in enumerate(dict.fromkeys(span["session"] for span in self.spans), 1)}
+        trace = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"session {session}"}}
+                 for session, pid in sessions.items()]
+        for span in self.spans:
+            pid = sessions[span["session"]]
+            args = {k: v for k, v in span.items() if k not in ("session", "agent", "start", "lane", "llm")}
+            trace.append({"name": span["agent"], "cat": "agent", "ph": "X", "pid": pid, "tid": span["lane"],
+                          "ts": span["start"] * 1e6, "dur": span["wall_s"] * 1e6, "args": args})
+            for call in span["llm"]:
+                trace.append({"name": f"{call['provider']} call", "cat": "llm", "ph": "X", "pid": pid, "tid": span["lane"],
+                              "ts": (call["end"] - call["latency_s"]) * 1e6, "dur": call["latency_s"] * 1e6,
+                              "args": {k: v for k, v in call.items() if k not in ("provider", "end")}})
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
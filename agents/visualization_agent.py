@@ -2,80 +2,128 @@ from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from google.adk.agents.invocation_context import InvocationContext
 from google.genai.types import Content, Part # For creating proper content
-import pandas as pd
-from io import StringIO # For pandas JSON reading
-import matplotlib.pyplot as plt
-import seaborn as sns # For more aesthetic plots
+import asyncio # For preparing plot data off the event loop
 import os # To ensure results directory exists and for path handling
+import re # For turning session ids and source names into directory names
 from typing import AsyncGenerator
+from agents.aggregates import category_date_revenue, product_revenue, state_aggregates # Materialized by the preprocessor
+from agents.artifact_store import load_frame # Shared DataFrame handoff between stages
+from agents.chart_renderer import DEFAULT_MAX_POINTS, downsample_revenue_series, prepare_revenue_series, render_charts, render_product_revenue, render_revenue_over_time # Process-pool rendering
+from agents.checkpoint_store import get_checkpoint_store, record_stage, restore_stage, stage_status_text, version_of # Incremental runs
+from agents.tracing import record_metrics # Per-stage rows for the pipeline trace
+
+RESULTS_DIR = "results"
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def results_dir_for(session_id: str, source: str = "") -> str:
+    """Directory for one session's charts of one source, e.g. results/batch-0001-sales/sales-3f2a9c1e.
+
+    Concurrent sessions never overwrite each other's charts, and charts restored
+    from a source's checkpoint can only have been drawn from that source. Without
+    a source (e.g. state prepared outside the pipeline) the session directory is used.
+    """
+    directory = os.path.join(RESULTS_DIR, _safe_name(session_id))
+    if source:
+        stem = _safe_name(os.path.splitext(os.path.basename(os.path.normpath(source)))[0])
+        directory = os.path.join(directory, f"{stem}-{version_of(os.path.abspath(source))[:8]}")
+    return directory
+
 
 class VisualizationAgent(BaseAgent):
+    max_points: int = DEFAULT_MAX_POINTS # Points plotted per time series after downsampling
+    downsample: str = "lttb" # "lttb" or "minmax" (keeps every bucket's extremes)
+
+    def __init__(self, name: str, max_points: int = DEFAULT_MAX_POINTS, downsample: str = "lttb"):
+        super().__init__(name=name)
+        object.__setattr__(self, 'max_points', max_points)
+        object.__setattr__(self, 'downsample', downsample)
+
+    def _prepare(self, state) -> tuple:
+        """Reduce the processed data to the small inputs the renderers need."""
+        agg = state_aggregates(state)
+        if agg is not None:
+            # Both charts plot rollups the preprocessor already computed; the rows are never reloaded
+            series = downsample_revenue_series(category_date_revenue(agg), self.max_points, self.downsample)
+            return agg["rows"], series, product_revenue(agg)
+        df = load_frame(state["processed_data_ref"])
+        series = prepare_revenue_series(df, self.max_points, self.downsample)
+        totals = None
+        if 'Product_Name' in df.columns and 'Revenue' in df.columns:
+            totals = df.groupby('Product_Name')['Revenue'].sum().sort_values(ascending=False)
+        return len(df), series, totals
+
     async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
         agent_name = self.name
         print(f"[{agent_name}]: Generating visualizations...")
         
-        processed_data_json = ctx.session.state.get("processed_data_json")
+        processed_data_ref = ctx.session.state.get("processed_data_ref")
         # Retrieve analyses, with defaults if not found
         gemini_analysis = ctx.session.state.get("gemini_analysis", "Gemini analysis not available.")
         openai_analysis = ctx.session.state.get("openai_analysis", "OpenAI analysis not available.")
 
-        if not processed_data_json:
+        if not processed_data_ref:
             error_msg = "Error: Processed data not found in state for visualization."
             print(f"[{agent_name}]: {error_msg}")
             content = Content(parts=[Part(text=error_msg)])
             yield Event(content=content, author=agent_name, turn_complete=True)
             return
 
+        # Charts depend on the data and on the analysis snippets in their titles
+        data_version = ctx.session.state.get("data_version")
+        input_version = version_of(data_version, gemini_analysis, openai_analysis)
+        if data_version and restore_stage(ctx.session.state, agent_name, input_version):
+            if all(os.path.exists(path) for path in ctx.session.state.get("visualization_paths", [])):
+                print(f"[{agent_name}]: Inputs unchanged, reusing existing charts")
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=True))])
+                yield Event(content=content, author=agent_name, turn_complete=True)
+                return
+
         try:
-            # Fix pandas warning by using StringIO
-            df = pd.read_json(StringIO(processed_data_json), orient="records")
-            # Ensure 'Date' is datetime for proper plotting
-            if 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'])
+            # Downsampling (and aggregation, without materialized aggregates) runs in a worker thread
+            rows, series, product_totals = await asyncio.to_thread(self._prepare, ctx.session.state)
+            print(f"[{agent_name}]: Plotting {len(series)} of {rows} points ({self.downsample} downsampling)")
+            record_metrics(rows_in=rows, rows_out=len(series))
             
-            # Ensure the 'results' directory exists for saving plots
-            os.makedirs("results", exist_ok=True)
-            
-            plot_paths = []
+            # Each session writes to its own directory; checkpointed paths keep pointing at it
+            results_dir = results_dir_for(ctx.session.id, ctx.session.state.get("data_source", ""))
+            os.makedirs(results_dir, exist_ok=True)
 
             # --- Plot 1: Sales Revenue Over Time ---
-            plt.figure(figsize=(12, 7)) # Adjusted size for better readability
-            sns.set_style("whitegrid") # Using Seaborn style
-            sns.lineplot(data=df, x='Date', y='Revenue', hue='Product_Category', marker='o')
-            plt.title(f"Sales Revenue Over Time\n(Gemini Trend Snippet: {gemini_analysis[:70]}...)")
-            plt.xlabel("Date")
-            plt.ylabel("Revenue ($)")
-            plt.xticks(rotation=45, ha='right')
-            plt.legend(title='Product Category')
-            plt.tight_layout() # Adjust layout to prevent labels from overlapping
-            sales_plot_path = os.path.join("results", "sales_revenue_over_time.png")
-            plt.savefig(sales_plot_path)
-            plt.close() # Close the plot to free memory
-            plot_paths.append(sales_plot_path)
-            content = Content(parts=[Part(text=f"Sales revenue plot saved to {sales_plot_path}")])
-            yield Event(content=content, author=agent_name)
+            sales_plot_path = os.path.join(results_dir, "sales_revenue_over_time.png")
+            jobs = [(render_revenue_over_time, (
+                series, f"Sales Revenue Over Time\n(Gemini Trend Snippet: {gemini_analysis[:70]}...)", sales_plot_path
+            ))]
+            labels = ["Sales revenue plot"]
 
             # --- Plot 2: Total Revenue by Product Name ---
-            if 'Product_Name' in df.columns and 'Revenue' in df.columns:
-                plt.figure(figsize=(10, 7))
-                product_revenue = df.groupby('Product_Name')['Revenue'].sum().sort_values(ascending=False)
-                # Fix seaborn warning by properly setting hue
-                sns.barplot(x=product_revenue.index, y=product_revenue.values, hue=product_revenue.index, palette="viridis", legend=False)
-                plt.title(f"Total Revenue by Product\n(OpenAI Anomaly Note: {openai_analysis[:70]}...)")
-                plt.xlabel("Product Name")
-                plt.ylabel("Total Revenue ($)")
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                product_plot_path = os.path.join("results", "product_revenue.png")
-                plt.savefig(product_plot_path)
-                plt.close()
-                plot_paths.append(product_plot_path)
-                content = Content(parts=[Part(text=f"Product revenue plot saved to {product_plot_path}")])
+            if product_totals is not None:
+                product_plot_path = os.path.join(results_dir, "product_revenue.png")
+                jobs.append((render_product_revenue, (
+                    product_totals, f"Total Revenue by Product\n(OpenAI Anomaly Note: {openai_analysis[:70]}...)", product_plot_path
+                )))
+                labels.append("Product revenue plot")
+
+            # Charts are independent, so they render in parallel in the process pool
+            # while the event loop keeps serving other sessions
+            render_times = await render_charts(jobs)
+            plot_paths = [args[2] for _, args in jobs]
+            for label, path, seconds in zip(labels, plot_paths, render_times):
+                content = Content(parts=[Part(text=f"{label} saved to {path} (rendered in {seconds:.2f}s)")])
                 yield Event(content=content, author=agent_name)
+            ctx.session.state["render_times"] = dict(zip(plot_paths, render_times))
+            record_metrics(render_s=round(sum(render_times), 4))
             
             # Store paths to generated visualizations in state
             ctx.session.state["visualization_paths"] = plot_paths
             print(f"[{agent_name}]: Generated {len(plot_paths)} visualizations")
+            if get_checkpoint_store() is not None and data_version:
+                record_stage(ctx.session.state, agent_name, input_version, ["visualization_paths"])
+                content = Content(parts=[Part(text=stage_status_text(agent_name, reused=False))])
+                yield Event(content=content, author=agent_name)
             content = Content(parts=[Part(text="Visualizations generated successfully.")])
             yield Event(content=content, author=agent_name, turn_complete=True)
 
@@ -0,0 +1,85 @@
+"""Compare the preprocessor's materialized aggregates with recomputing rollups in every stage.
+
+"recompute" is the path without materialized aggregates: the summarizer scans
+every chunk and the visualizer concatenates the chunks and groups them again.
+"materialized" builds the aggregates once, while cleaning, and both stages read
+them. Also measured: folding appended rows into existing aggregates versus a
+full recompute, and slicing a date range with the date index versus a full
+scan. Run from the project root:
+    python -m benchmarks.bench_aggregates --rows 1000000 --chunks 10
+"""
+import argparse
+import time
+import pandas as pd
+
+from agents.aggregates import aggregate_frames, category_date_revenue, frames_in_range, product_revenue
+from agents.artifact_store import get_artifact_store, load_frame
+from agents.chart_renderer import downsample_revenue_series, prepare_revenue_series
+from agents.data_preprocessor_agent import clean_frame
+from agents.data_summarizer_agent import finalize_digest
+from benchmarks.synthetic_data import make_sales_frame
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def recompute(refs) -> None:
+    store = get_artifact_store()
+    finalize_digest(aggregate_frames(store.get(ref) for ref in refs)) # Summarizer
+    df = load_frame(refs) # Visualizer
+    prepare_revenue_series(df)
+    df.groupby('Product_Name')['Revenue'].sum().sort_values(ascending=False)
+
+
+def read_materialized(agg) -> None:
+    finalize_digest(agg) # Summarizer
+    downsample_revenue_series(category_date_revenue(agg)) # Visualizer
+    product_revenue(agg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunks", type=int, default=10, help="Processed chunks the rows are split into")
+    parser.add_argument("--append-rows", type=int, default=10_000, help="Rows appended for the incremental case")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    store = get_artifact_store()
+    chunk_rows = -(-args.rows // args.chunks)
+    frames = [clean_frame(make_sales_frame(min(chunk_rows, args.rows - offset), offset=offset, total_rows=args.rows))
+              for offset in range(0, args.rows, chunk_rows)]
+    refs = [store.put(frame, name="processed_data_chunk") for frame in frames]
+    build_s = best_of(lambda: aggregate_frames(frames), args.repeat)
+    agg = aggregate_frames(frames)
+
+    appended = clean_frame(make_sales_frame(args.append_rows, offset=args.rows, total_rows=args.rows))
+    start, end = agg["date_max"] - pd.Timedelta(days=30), agg["date_max"]
+
+    print(f"Aggregates benchmark ({args.rows:,} rows in {len(frames)} chunks, best of {args.repeat})")
+    print(f"{'case':<44}{'seconds':>10}")
+    rows = [
+        ("summarizer + visualizer, recompute", best_of(lambda: recompute(refs), args.repeat)),
+        ("build aggregates once (preprocessor)", build_s),
+        ("summarizer + visualizer, materialized", best_of(lambda: read_materialized(agg), args.repeat)),
+        (f"append {args.append_rows:,} rows, full recompute",
+         best_of(lambda: aggregate_frames(frames + [appended]), args.repeat)),
+        (f"append {args.append_rows:,} rows, incremental",
+         best_of(lambda: aggregate_frames([appended], agg), args.repeat)),
+        ("last 30 days, full scan", best_of(lambda: (lambda df: df[(df['Date'] >= start) & (df['Date'] <= end)])(
+            load_frame(refs)), args.repeat)),
+        ("last 30 days, date index", best_of(lambda: pd.concat(list(frames_in_range(refs, agg, start, end))),
+                                             args.repeat)),
+    ]
+    for label, seconds in rows:
+        print(f"{label:<44}{seconds:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
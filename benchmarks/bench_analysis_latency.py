@@ -0,0 +1,93 @@
+"""Measure analysis-stage latency with the analysts run sequentially versus in parallel.
+
+Provider calls are replaced by simulated latency so the numbers isolate the
+orchestration cost. Run from the project root:
+    python -m benchmarks.bench_analysis_latency --gemini-latency 2.0 --openai-latency 1.5
+"""
+import argparse
+import asyncio
+import time
+from google.adk import Runner
+from google.adk.agents import ParallelAgent, SequentialAgent
+from google.adk.sessions import InMemorySessionService
+from google.genai.types import Content, Part
+
+from agents.artifact_store import get_artifact_store
+from agents.data_preprocessor_agent import clean_frame
+from agents.google_llm_analyst_agent import GeminiAnalystAgent
+from agents.llm_cache import set_llm_cache
+from agents.openai_llm_analyst_agent import OpenAiAnalystAgent
+from benchmarks.synthetic_data import make_sales_frame
+
+
+class SimulatedGeminiAnalyst(GeminiAnalystAgent):
+    latency: float = 0.0
+
+    async def _generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return "Simulated Gemini trend analysis."
+
+
+class SimulatedOpenAiAnalyst(OpenAiAnalystAgent):
+    latency: float = 0.0
+
+    async def _generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return "Simulated OpenAI anomaly report."
+
+
+def build_analysts(gemini_latency: float, openai_latency: float):
+    gemini = SimulatedGeminiAnalyst(name="GeminiAnalyst")
+    openai = SimulatedOpenAiAnalyst(name="OpenAIAnalyst")
+    object.__setattr__(gemini, 'latency', gemini_latency)
+    object.__setattr__(openai, 'latency', openai_latency)
+    return [gemini, openai]
+
+
+async def time_stage(stage, processed_data_ref: str) -> float:
+    app_name = "AnalysisLatencyBenchmark"
+    session_service = InMemorySessionService()
+    runner = Runner(app_name=app_name, agent=stage, session_service=session_service)
+    await session_service.create_session(
+        app_name=app_name, user_id="bench", session_id=stage.name,
+        state={"processed_data_ref": processed_data_ref}
+    )
+    start = time.perf_counter()
+    async for _ in runner.run_async(
+        user_id="bench", session_id=stage.name,
+        new_message=Content(role="user", parts=[Part(text="Analyze the processed data.")])
+    ):
+        pass
+    return time.perf_counter() - start
+
+
+async def run(gemini_latency: float, openai_latency: float):
+    # Every run must pay the simulated provider latency, so bypass the response cache
+    set_llm_cache(None)
+    df = clean_frame(make_sales_frame(1_000))
+    processed_data_ref = get_artifact_store().put(df, name="processed_data")
+
+    # Warm up imports and session plumbing so the first measured run is not penalized
+    await time_stage(ParallelAgent(name="WarmUp", sub_agents=build_analysts(0.0, 0.0)), processed_data_ref)
+
+    sequential = SequentialAgent(name="SequentialAnalysis", sub_agents=build_analysts(gemini_latency, openai_latency))
+    parallel = ParallelAgent(name="ParallelAnalysis", sub_agents=build_analysts(gemini_latency, openai_latency))
+    before = await time_stage(sequential, processed_data_ref)
+    after = await time_stage(parallel, processed_data_ref)
+
+    print(f"Analysis stage latency (Gemini {gemini_latency:.2f}s, OpenAI {openai_latency:.2f}s)")
+    print(f"  sequential: {before:.3f}s")
+    print(f"  parallel:   {after:.3f}s")
+    print(f"  saved:      {before - after:.3f}s ({before / after:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--openai-latency", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.gemini_latency, args.openai_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare the per-stage cost of the JSON session-state handoff with the artifact store.
+
+Run from the project root:
+    python -m benchmarks.bench_handoff --rows 1000000
+"""
+import argparse
+import time
+import tracemalloc
+from io import StringIO
+import pandas as pd
+
+from agents.artifact_store import ArtifactStore
+from benchmarks.synthetic_data import make_sales_frame
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    df[numeric_cols] = df[numeric_cols].fillna(0)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+
+def run_json_path(df: pd.DataFrame):
+    state = {}
+    stages = [
+        ("collect", lambda: state.__setitem__("raw_data_json", df.to_json(orient="records", date_format="iso"))),
+        ("preprocess", lambda: state.__setitem__("processed_data_json", preprocess(
+            pd.read_json(StringIO(state["raw_data_json"]), orient="records")).to_json(orient="records", date_format="iso"))),
+        ("visualize", lambda: pd.read_json(StringIO(state["processed_data_json"]), orient="records")),
+    ]
+    return [(name,) + measure(fn)[1:] for name, fn in stages]
+
+
+def run_store_path(df: pd.DataFrame, store: ArtifactStore):
+    state = {}
+    stages = [
+        ("collect", lambda: state.__setitem__("raw_data_ref", store.put(df, name="raw_data"))),
+        ("preprocess", lambda: state.__setitem__("processed_data_ref", store.put(
+            preprocess(store.get(state["raw_data_ref"]).copy()), name="processed_data"))),
+        ("visualize", lambda: store.get(state["processed_data_ref"])),
+    ]
+    return [(name,) + measure(fn)[1:] for name, fn in stages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--arrow-dir", default=None, help="Back the store with memory-mapped Arrow files in this directory")
+    args = parser.parse_args()
+
+    df = make_sales_frame(args.rows)
+    store = ArtifactStore(root=args.arrow_dir)
+    json_results = run_json_path(df)
+    store_results = run_store_path(df, store)
+    store.clear()
+
+    print(f"Handoff benchmark ({args.rows:,} rows, store={'arrow' if args.arrow_dir else 'memory'})")
+    print(f"{'stage':<12}{'json s':>10}{'store s':>10}{'speedup':>10}{'json MiB':>12}{'store MiB':>12}")
+    for (name, j_time, j_mem), (_, s_time, s_mem) in zip(json_results, store_results):
+        speedup = j_time / s_time if s_time else float('inf')
+        print(f"{name:<12}{j_time:>10.3f}{s_time:>10.3f}{speedup:>9.1f}x{j_mem:>12.1f}{s_mem:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Benchmark the full pipeline on synthetic data against local LLM stand-ins.
+
+Gemini and OpenAI are replaced by local stub servers with configurable latency,
+so no API keys or network access are needed and every run pays the same LLM
+cost. Each dataset size runs in a fresh process, so peak RSS is per run.
+Results are written as JSON; pass a previous file as --baseline to flag
+regressions. Run from the project root:
+    python -m benchmarks.bench_pipeline --rows 10000 100000 1000000 --output bench.json
+    python -m benchmarks.bench_pipeline --rows 100000 --baseline bench.json
+
+MAS_* settings (e.g. MAS_INGEST_CHUNK_ROWS, MAS_ARTIFACT_DIR) apply as usual.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from agents.tracing import peak_rss_mb, state_bytes
+from benchmarks.stub_llm_server import start_stub_server
+from benchmarks.synthetic_data import ensure_dataset
+
+APP_NAME = "PipelineBenchmark"
+DEFAULT_RESULTS_DIR = os.path.join(".cache", "bench_results")
+# Metrics compared against a baseline; larger is worse for all of them
+REGRESSION_METRICS = ["wall_s", "peak_rss_mb"]
+
+
+def _stage_probe():
+    from batch_runner import StageTimer
+
+    class StageProbe(StageTimer):
+        """StageTimer that also records peak RSS and session-state size when each agent finishes."""
+
+        def __init__(self):
+            super().__init__()
+            self.stages: List[Dict[str, object]] = []
+
+        def after(self, callback_context):
+            super().after(callback_context)
+            name = callback_context.agent_name
+            self.stages.append({
+                "agent": name,
+                "wall_s": round(self.durations[name][-1], 4),
+                "peak_rss_mb": peak_rss_mb(),
+                "state_bytes": state_bytes(callback_context.session.state),
+            })
+            return None
+
+    return StageProbe()
+
+
+async def _run_pipeline(source: str) -> Dict[str, object]:
+    from google.adk import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+    from agents.chart_renderer import shutdown_render_pool
+    from agents.llm_clients import close_clients
+    from main_orchestrator import build_pipeline, configure_from_env, initial_session_state
+
+    configure_from_env()
+    pipeline = build_pipeline()
+    probe = _stage_probe()
+    probe.attach(pipeline)
+    session_service = InMemorySessionService()
+    runner = Runner(app_name=APP_NAME, agent=pipeline, session_service=session_service)
+    await session_service.create_session(
+        app_name=APP_NAME, user_id="bench", session_id="bench", state={**initial_session_state(), "source_path": source}
+    )
+
+    errors = []
+    started = time.perf_counter()
+    async for event in runner.run_async(
+        user_id="bench", session_id="bench", new_message=Content(role="user", parts=[Part(text="Analyze the data.")])
+    ):
+        for part in (event.content.parts if event.content else []):
+            if part.text and part.text.startswith("Error"):
+                errors.append(f"{event.author}: {part.text}")
+    wall = time.perf_counter() - started
+    await close_clients()
+    shutdown_render_pool()
+
+    final_state = next((stage["state_bytes"] for stage in reversed(probe.stages)
+                        if stage["agent"] == pipeline.name), None)
+    return {"wall_s": round(wall, 4), "peak_rss_mb": peak_rss_mb(), "state_bytes": final_state,
+            "stages": probe.stages, "errors": errors}
+
+
+def measure_pipeline(source: str) -> Dict[str, object]:
+    """One pipeline run; executed in a fresh process."""
+    return asyncio.run(_run_pipeline(source))
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Describe every metric that is more than `tolerance` worse than in the baseline run of the same size."""
+    previous = {run["rows"]: run for run in baseline.get("results", [])}
+    regressions = []
+    for run in results:
+        base = previous.get(run["rows"])
+        if base is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            if run.get(metric) and base.get(metric) and run[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{run['rows']:,} rows: {metric} {base[metric]} -> {run[metric]} "
+                                   f"(+{run[metric] / base[metric] - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="Seconds per stub Gemini response")
+    parser.add_argument("--openai-latency", type=float, default=1.0, help="Seconds per stub OpenAI response")
+    parser.add_argument("--output", default=None, help=f"Results JSON (default: {DEFAULT_RESULTS_DIR}/pipeline-<time>.json)")
+    parser.add_argument("--baseline", default=None, help="Previous results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown/growth versus the baseline")
+    args = parser.parse_args()
+
+    # One stub per provider, so each can have its own latency
+    gemini_stub = start_stub_server(latency=args.gemini_latency)
+    openai_stub = start_stub_server(latency=args.openai_latency)
+    os.environ.update({
+        "GOOGLE_AI_API_ENDPOINT": f"http://127.0.0.1:{gemini_stub.server_address[1]}",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_stub.server_address[1]}/v1",
+        "GOOGLE_AI_API_KEY": "stub",
+        "OPENAI_API_KEY": "stub",
+        "MAS_LLM_CACHE": "off", # Every run must pay the simulated provider latency
+    })
+
+    results = []
+    for rows in args.rows:
+        source = ensure_dataset(rows, args.seed)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            run = pool.submit(measure_pipeline, source).result()
+        run = {"rows": rows, "source_bytes": os.path.getsize(source), **run,
+               "rows_per_s": round(rows / run["wall_s"], 1)}
+        results.append(run)
+        print(f"{rows:>12,} rows  {run['wall_s']:>8.2f}s  {run['rows_per_s']:>12,.0f} rows/s  "
+              f"peak RSS {run['peak_rss_mb'] or 0:>8.1f} MiB  state {run['state_bytes'] or 0:>8,} B"
+              f"{'  (' + str(len(run['errors'])) + ' errors)' if run['errors'] else ''}")
+        for stage in run["stages"]:
+            print(f"    {stage['agent']:<24}{stage['wall_s']:>8.3f}s  peak RSS {stage['peak_rss_mb'] or 0:>8.1f} MiB"
+                  f"  state {stage['state_bytes']:>8,} B")
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"seed": args.seed, "gemini_latency": args.gemini_latency, "openai_latency": args.openai_latency,
+                     **{key: value for key, value in os.environ.items() if key.startswith("MAS_")}},
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"pipeline-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare reading a whole wide export with reading only what the pipeline uses.
+
+The same synthetic sales data, with extra columns the pipeline never reads
+(as in a typical export), is written as CSV, Parquet, a Parquet dataset
+partitioned by category, Feather and SQLite. Each source is read in full and
+with the selection "last 30 days, Gadgets only", through the readers used by
+DataCollectorAgent, reporting the size of the files opened: for a partitioned
+dataset only the matching partitions are. Within a Parquet file, row groups
+outside the date range are skipped as well. Run from the project root:
+    python -m benchmarks.bench_sources --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import closing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from agents.data_sources import ArrowSource, SourceFilters, open_source, source_bytes
+from benchmarks.synthetic_data import DEFAULT_DATA_DIR, make_sales_frame
+
+
+def make_wide_frame(rows: int) -> pd.DataFrame:
+    """Sales rows plus order, customer, region and free-text columns."""
+    df = make_sales_frame(rows)
+    rng = np.random.default_rng(1)
+    df["Order_ID"] = np.arange(rows)
+    df["Customer_ID"] = rng.integers(0, 100_000, rows)
+    df["Region"] = rng.choice(["North", "South", "East", "West"], rows)
+    df["Sales_Rep"] = rng.choice([f"rep-{i:03d}" for i in range(200)], rows)
+    df["Notes"] = rng.choice(["", "gift wrap", "expedited shipping", "returned item, refund pending"], rows)
+    return df
+
+
+def write_sources(df: pd.DataFrame, directory: str) -> dict:
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "CSV": os.path.join(directory, "sales.csv"),
+        "Parquet": os.path.join(directory, "sales.parquet"),
+        "Parquet, partitioned": os.path.join(directory, "sales_by_category"),
+        "Feather": os.path.join(directory, "sales.feather"),
+        "SQLite": os.path.join(directory, "sales.db"),
+    }
+    if os.path.exists(paths["SQLite"]):
+        return paths
+    df.to_csv(paths["CSV"], index=False, date_format="%Y-%m-%d")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Rows are in date order, so each row group covers a narrow date range
+    pq.write_table(table, paths["Parquet"], row_group_size=100_000)
+    pq.write_to_dataset(table, paths["Parquet, partitioned"], partition_cols=["Product_Category"],
+                        row_group_size=100_000)
+    df.to_feather(paths["Feather"])
+    # closing() closes the database before it is moved; the inner block commits
+    with closing(sqlite3.connect(paths["SQLite"] + ".tmp")) as connection, connection:
+        df.assign(Date=df['Date'].dt.strftime("%Y-%m-%d")).to_sql("sales", connection, index=False, chunksize=100_000)
+        connection.execute('CREATE INDEX sales_date ON sales ("Date")')
+    os.replace(paths["SQLite"] + ".tmp", paths["SQLite"])
+    return paths
+
+
+def best_of(fn, repeat: int):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30, help="Length of the selected date range")
+    parser.add_argument("--category", default="Gadgets")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_wide_frame(args.rows)
+    everything = SourceFilters(columns=list(df.columns)) # As the collector read sources before pushdown
+    end = df['Date'].max()
+    start = end - pd.Timedelta(days=args.days - 1)
+    paths = write_sources(df, os.path.join(DEFAULT_DATA_DIR, f"sources-{args.rows}"))
+    del df
+    selection = SourceFilters(start=str(start.date()), end=str(end.date()), categories=[args.category])
+
+    print(f"Source benchmark ({args.rows:,} rows, 10 columns; selection: {selection}; best of {args.repeat})")
+    print(f"{'source':<24}{'read':<12}{'rows':>10}{'columns':>9}{'files MB':>12}{'seconds':>10}")
+    for kind, path in paths.items():
+        for label, filters in (("everything", everything), ("selection", selection)):
+            source = open_source(path, filters)
+            seconds, frame = best_of(source.read, args.repeat)
+            files = source.files_scanned() if isinstance(source, ArrowSource) else [path]
+            scanned = sum(source_bytes(f) for f in files) / 2**20
+            print(f"{kind:<24}{label:<12}{len(frame):>10,}{frame.shape[1]:>9}{scanned:>12.1f}{seconds:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Track cold-start cost: importing main_orchestrator and time to the first pipeline event.
+
+Each measurement runs in a fresh interpreter, so nothing is already imported or
+cached in memory. Run from the project root:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Libraries that should not be imported just by loading the orchestrator
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "seaborn", "openai", "google.generativeai", "pyarrow"]
+
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json, sys
+import main_orchestrator
+imported = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+
+async def first_event():
+    # Same path as `python main_orchestrator.py`: configuration, pipeline, session and opening message
+    main_orchestrator.configure_from_env()
+    state = {{**main_orchestrator.initial_session_state(), "source_path": {source!r}}}
+    _, events = await main_orchestrator.start_pipeline(main_orchestrator.build_pipeline(), "bench", state)
+    await events.__anext__()
+    first = time.perf_counter()
+    await events.aclose()
+    return first
+
+first = asyncio.run(first_event())
+print(json.dumps({{"import_s": imported - started, "first_event_s": first - started, "heavy": heavy}}))
+"""
+
+
+def run_child(source: str) -> dict:
+    env = dict(os.environ, MAS_LLM_CACHE="off")
+    out = subprocess.run([sys.executable, "-c", CHILD.format(heavy=HEAVY_MODULES, source=source)],
+                         capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_interpreter() -> float:
+    """Wall time of a bare interpreter start, for reference."""
+    out = subprocess.run([sys.executable, "-c", "import time; print(time.perf_counter())"],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    from main_orchestrator import write_sample_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "sales.csv")
+        write_sample_data(source)
+        runs = [run_child(source) for _ in range(args.repeat)]
+
+    print(f"Startup benchmark ({args.repeat} fresh interpreters, median / min)")
+    for key, label in (("import_s", "import main_orchestrator"), ("first_event_s", "first pipeline event")):
+        values = [run[key] for run in runs]
+        print(f"{label:<28}{statistics.median(values):>8.3f}s{min(values):>8.3f}s")
+    print(f"Heavy modules loaded by import: {', '.join(runs[0]['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Local stand-in for the OpenAI and Gemini HTTP APIs.
+
+Serves canned responses with configurable latency and a configurable share of
+transient failures (429/503), so pooling, retries and deadlines can be
+exercised without network access or API keys.
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8765 --latency 0.5 --fail-rate 0.3
+
+Then point the pipeline at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 GOOGLE_AI_API_ENDPOINT=http://127.0.0.1:8765 \\
+    OPENAI_API_KEY=stub GOOGLE_AI_API_KEY=stub MAS_LLM_CACHE=off python main_orchestrator.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, so client connection pooling is observable
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload: dict, headers: dict = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        time.sleep(server.latency)
+
+        if random.random() < server.fail_rate:
+            with server.lock:
+                server.failures += 1
+            status = random.choice([429, 503])
+            self._reply(status, {"error": {"code": status, "message": "stub transient failure", "status": "UNAVAILABLE"}},
+                        {"Retry-After": "0.1"} if status == 429 else None)
+            return
+
+        if self.path.startswith("/v1/chat/completions"):
+            self._reply(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "- Stub OpenAI analysis: no anomalies worth escalating."},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 12, "total_tokens": 112},
+            })
+        elif ":generateContent" in self.path:
+            self._reply(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": "- Stub Gemini analysis: revenue trending up."}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 10, "totalTokenCount": 110},
+            })
+        else:
+            self._reply(404, {"error": {"code": 404, "message": f"unknown path {self.path}"}})
+
+
+def start_stub_server(port: int = 0, latency: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; `server.server_address[1]` is the bound port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.failures = 0
+    server.connections = set() # Distinct client (host, port) pairs, i.e. TCP connections opened
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 429/503")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.latency, args.fail_rate)
+    print(f"Stub LLM server on http://127.0.0.1:{server.server_address[1]} "
+          f"(latency {args.latency}s, fail rate {args.fail_rate:.0%}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"  {server.requests} requests, {server.failures} failures, {len(server.connections)} connections")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic sales data in the pipeline's schema, from a few rows to tens of millions.
+
+Rows are in date order, so a file can also be grown as an append-only source.
+Large files are written in chunks and never held in memory at once. Run from
+the project root:
+    python -m benchmarks.synthetic_data --rows 10000000 --out data/sales_10m.csv
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_DATA_DIR = os.path.join(".cache", "bench_data")
+
+CATALOG = {
+    "Gadgets": ["AlphaSpark", "AlphaSpark Pro", "OmegaDial", "PulseBand", "ZetaCharge"],
+    "Widgets": ["BetaBolt", "BetaBolt Mini", "KappaClip", "SigmaHinge", "TauLatch"],
+    "Gizmos": ["GammaGizmo", "DeltaDrone", "EpsilonEye", "ThetaTrack", "IotaLens"],
+    "Tools": ["LambdaLever", "MuMeter", "NuNailer", "XiDriver", "OmicronSaw"],
+    "Home": ["PiPillow", "RhoRug", "UpsilonUrn", "PhiFan", "ChiClock"],
+    "Outdoor": ["PsiPack", "AlphaTent", "BetaBottle", "GammaGrill", "DeltaDeck"],
+}
+PRODUCTS = np.array([product for products in CATALOG.values() for product in products])
+CATEGORIES = np.array([category for category, products in CATALOG.items() for _ in products])
+
+
+def make_sales_frame(rows: int, seed: int = 0, offset: int = 0, total_rows: int = None,
+                     start: str = "2023-01-01", days: int = 730,
+                     anomaly_rate: float = 0.0005, missing_rate: float = 0.001) -> pd.DataFrame:
+    """Sales records `offset .. offset + rows` of a dataset of `total_rows` rows spread over `days` days.
+
+    Each product has its own price and demand level; a small share of rows are
+    demand spikes (for the anomaly engine) or have a missing Revenue (for the
+    preprocessor). The same seed and offset always give the same rows.
+    """
+    total_rows = total_rows or rows
+    catalog_rng = np.random.default_rng(seed)
+    base_price = catalog_rng.uniform(5.0, 200.0, len(PRODUCTS)).round(2)
+    base_units = catalog_rng.uniform(5.0, 120.0, len(PRODUCTS))
+
+    rng = np.random.default_rng([seed, offset])
+    positions = offset + np.arange(rows)
+    day = positions * days // total_rows
+    idx = rng.integers(0, len(PRODUCTS), rows)
+    units = rng.poisson(base_units[idx]) + 1
+    spikes = rng.random(rows) < anomaly_rate
+    units[spikes] *= 10
+    revenue = (units * base_price[idx] * rng.uniform(0.9, 1.1, rows)).round(2)
+    revenue[rng.random(rows) < missing_rate] = np.nan
+    return pd.DataFrame({
+        "Date": pd.Timestamp(start) + pd.to_timedelta(day, unit="D"),
+        "Product_Name": PRODUCTS[idx],
+        "Product_Category": CATEGORIES[idx],
+        "Units_Sold": units,
+        "Revenue": revenue,
+    })
+
+
+def write_sales_csv(path: str, rows: int, seed: int = 0, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+    """Write a synthetic dataset chunk by chunk; the file appears atomically when complete."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        for offset in range(0, rows, chunk_rows):
+            chunk = make_sales_frame(min(chunk_rows, rows - offset), seed=seed, offset=offset, total_rows=rows)
+            chunk.to_csv(f, index=False, header=offset == 0, date_format="%Y-%m-%d")
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_dataset(rows: int, seed: int = 0, directory: str = DEFAULT_DATA_DIR) -> str:
+    """Path of a cached synthetic dataset, generating it on first use."""
+    path = os.path.join(directory, f"sales-{rows}-seed{seed}.csv")
+    if not os.path.exists(path):
+        write_sales_csv(path, rows, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help="CSV path to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_sales_csv(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} rows to {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
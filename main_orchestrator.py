@@ -1,41 +1,166 @@
+import argparse
 import asyncio
+import os
+import time
+from typing import AsyncGenerator, Optional, Tuple
 from dotenv import load_dotenv # Load environment variables from .env file
-from google.adk.agents import SequentialAgent # For orchestration
+from google.adk.agents import ParallelAgent, SequentialAgent # For orchestration
 from google.adk.events import Event
 from google.adk.sessions import InMemorySessionService
 from google.adk import Runner
+from google.genai.types import Content, Part # The run's opening user message
 
-# Import our custom agent classes
-from agents.data_collector_agent import DataCollectorAgent
-from agents.data_preprocessor_agent import DataPreprocessorAgent
-from agents.google_llm_analyst_agent import GeminiAnalystAgent
-from agents.openai_llm_analyst_agent import OpenAiAnalystAgent
-from agents.visualization_agent import VisualizationAgent
+# Our custom agents are loaded lazily: each stage imports its module (and pandas,
+# matplotlib or a provider SDK with it) only when it first runs
+from agents.lazy_agent import LazyAgent
+from agents.llm_cache import DEFAULT_CACHE_DIR, LLMResponseCache, get_llm_cache, set_llm_cache
+from agents.llm_clients import close_clients
+from agents.tracing import PipelineTracer, attach_callbacks
 
-# For self-contained demo, create sample data
-import pandas as pd
-import os
-os.makedirs("data", exist_ok=True)
-sample_df = pd.DataFrame({
-    'Date': pd.to_datetime(['2023-01-01', '2023-01-15', '2023-02-01', '2023-02-12', '2023-03-05', '2023-03-20']),
-    'Product_Name': ['AlphaSpark', 'BetaBolt', 'AlphaSpark', 'GammaGizmo', 'BetaBolt', 'AlphaSpark'],
-    'Product_Category': ['Gadgets', 'Widgets', 'Gadgets', 'Gizmos', 'Widgets', 'Gadgets'],
-    'Units_Sold': [100, 50, 120, 80, 45, 150],
-    'Revenue': [1200.00, 750.00, 1440.00, 1250.00, 675.00, 1800.00]
-})
-sample_df.to_csv("data/sample_sales_data.csv", index=False)
-# This ensures the tutorial is runnable out-of-the-box, a key for good learner experience.
-
-# Load environment variables from .env file
-load_dotenv()
-
-async def main():
+SAMPLE_DATA_PATH = os.path.join("data", "sample_sales_data.csv")
+APP_NAME = "ADKDataAnalyticsMAS"
+USER_ID = "tutorial_user"
+
+# State keys holding artifacts that no later stage reads, by the last stage that reads them
+RELEASE_AFTER = {
+    "Preprocessor": ["raw_data_ref"],
+    # Read by the Summarizer, both analysts and the Visualizer
+    "Visualizer": ["processed_data_ref", "aggregates_ref"],
+}
+
+
+def write_sample_data(path: str = SAMPLE_DATA_PATH) -> None:
+    """Write the small demo dataset (`--demo`), so the tutorial is runnable out-of-the-box."""
+    import pandas as pd
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sample_df = pd.DataFrame({
+        'Date': pd.to_datetime(['2023-01-01', '2023-01-15', '2023-02-01', '2023-02-12', '2023-03-05', '2023-03-20']),
+        'Product_Name': ['AlphaSpark', 'BetaBolt', 'AlphaSpark', 'GammaGizmo', 'BetaBolt', 'AlphaSpark'],
+        'Product_Category': ['Gadgets', 'Widgets', 'Gadgets', 'Gizmos', 'Widgets', 'Gadgets'],
+        'Units_Sold': [100, 50, 120, 80, 45, 150],
+        'Revenue': [1200.00, 750.00, 1440.00, 1250.00, 675.00, 1800.00]
+    })
+    sample_df.to_csv(path, index=False)
+
+
+def configure_from_env():
+    """Install the shared stores and caches selected by MAS_* environment variables."""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Optionally back the shared artifact store with memory-mapped Arrow files on disk
+    artifact_dir = os.getenv("MAS_ARTIFACT_DIR")
+    if artifact_dir:
+        from agents.artifact_store import ArtifactStore, set_artifact_store
+        set_artifact_store(ArtifactStore(root=artifact_dir))
+    else:
+        # Or keep frames in memory up to a budget, spilling the least recently used ones to disk
+        memory_budget_mb = os.getenv("MAS_MEMORY_BUDGET_MB")
+        if memory_budget_mb:
+            from agents.artifact_store import ArtifactStore, set_artifact_store
+            set_artifact_store(ArtifactStore(
+                memory_budget_mb=float(memory_budget_mb),
+                spill_dir=os.getenv("MAS_SPILL_DIR"),
+                spill_compression=os.getenv("MAS_SPILL_COMPRESSION", "zstd")
+            ))
+
+    # Incremental mode: process only appended rows and skip stages whose inputs are unchanged
+    if os.getenv("MAS_INCREMENTAL", "off").lower() == "on":
+        from agents.checkpoint_store import DEFAULT_CHECKPOINT_DIR, CheckpointStore, set_checkpoint_store
+        set_checkpoint_store(CheckpointStore(root=os.getenv("MAS_CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)))
+
+    # Repeat runs on unchanged data reuse cached LLM responses; MAS_LLM_CACHE=off disables this
+    if os.getenv("MAS_LLM_CACHE", "on").lower() == "off":
+        set_llm_cache(None)
+    else:
+        set_llm_cache(LLMResponseCache(
+            root=os.getenv("MAS_LLM_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_mb=float(os.getenv("MAS_LLM_CACHE_MAX_MB", "100")),
+            ttl_seconds=float(os.getenv("MAS_LLM_CACHE_TTL_HOURS", "24")) * 3600
+        ))
+
+
+def initial_session_state() -> dict:
+    """State every new session starts with, e.g. its LLM deadline from MAS_PIPELINE_DEADLINE_S."""
+    state = {}
+    # Source to read (CSV, Parquet/Feather file or dataset directory, SQLite database) and the selection
+    # pushed down into the reader; batch runs override source_path per session
+    if os.getenv("MAS_SOURCE"):
+        state["source_path"] = os.getenv("MAS_SOURCE")
+    if os.getenv("MAS_SOURCE_TABLE"):
+        state["source_table"] = os.getenv("MAS_SOURCE_TABLE")
+    source_filters = {
+        "start": os.getenv("MAS_SOURCE_START"),
+        "end": os.getenv("MAS_SOURCE_END"),
+        "categories": [c.strip() for c in os.getenv("MAS_SOURCE_CATEGORIES", "").split(",") if c.strip()],
+        "columns": [c.strip() for c in os.getenv("MAS_SOURCE_COLUMNS", "").split(",") if c.strip()],
+    }
+    source_filters = {key: value for key, value in source_filters.items() if value}
+    if source_filters:
+        state["source_filters"] = source_filters
+    # Provider retries stop once the deadline passes and the analysts fall back to local reports
+    deadline_s = os.getenv("MAS_PIPELINE_DEADLINE_S")
+    if deadline_s:
+        state["pipeline_deadline"] = time.time() + float(deadline_s)
+    return state
+
+
+def build_tracer() -> Optional[PipelineTracer]:
+    """Per-stage tracer for a run; on unless MAS_TRACE=off."""
+    if os.getenv("MAS_TRACE", "on").lower() == "off":
+        return None
+    return PipelineTracer()
+
+
+def export_trace(tracer: PipelineTracer) -> None:
+    """Write the trace files requested by MAS_TRACE_FILE (Chrome trace JSON) and MAS_TRACE_EVENTS_FILE (JSON lines)."""
+    trace_file = os.getenv("MAS_TRACE_FILE")
+    if trace_file:
+        tracer.export_chrome_trace(trace_file)
+        print(f"🧭 Trace written to {trace_file} (open in chrome://tracing or https://ui.perfetto.dev)")
+    events_file = os.getenv("MAS_TRACE_EVENTS_FILE")
+    if events_file:
+        tracer.export_events(events_file)
+        print(f"🧭 Trace events written to {events_file}")
+
+
+def build_pipeline() -> SequentialAgent:
+    """Assemble the agent pipeline. One pipeline can serve many concurrent sessions."""
     # Initialize agents
-    data_collector = DataCollectorAgent(name="DataCollector")
-    preprocessor = DataPreprocessorAgent(name="Preprocessor")
-    gemini_analyst = GeminiAnalystAgent(name="GeminiAnalyst", model_name="gemini-1.5-flash") 
-    openai_analyst = OpenAiAnalystAgent(name="OpenAIAnalyst", model_name="gpt-4o-mini")
-    visualizer = VisualizationAgent(name="Visualizer")
+    # Streaming ingestion is enabled by setting a chunk size or a per-chunk memory budget
+    chunk_rows = os.getenv("MAS_INGEST_CHUNK_ROWS")
+    memory_budget_mb = os.getenv("MAS_INGEST_MEMORY_MB")
+    data_collector = LazyAgent(
+        "DataCollector", "agents.data_collector_agent:DataCollectorAgent",
+        chunk_rows=int(chunk_rows) if chunk_rows else None,
+        memory_budget_mb=float(memory_budget_mb) if memory_budget_mb else None
+    )
+    preprocessor = LazyAgent("Preprocessor", "agents.data_preprocessor_agent:DataPreprocessorAgent")
+    summarizer = LazyAgent("Summarizer", "agents.data_summarizer_agent:DataSummarizerAgent")
+    # MAS_ANALYSIS_MODE=map_reduce analyzes partitions of the data concurrently and merges the findings
+    analyst_kwargs = {}
+    if os.getenv("MAS_ANALYSIS_MODE", "digest").lower() == "map_reduce":
+        analyst_kwargs = {"prompt_mode": "map_reduce", "map_reduce": {
+            "partition_by": os.getenv("MAS_PARTITION_BY", "month"),
+            "partition_size": int(os.getenv("MAS_PARTITION_SIZE", "3")),
+            "max_parallel": int(os.getenv("MAS_MAP_PARALLELISM", "4")),
+            "token_budget": int(os.getenv("MAS_TOKEN_BUDGET", "50000"))
+        }}
+    gemini_analyst = LazyAgent("GeminiAnalyst", "agents.google_llm_analyst_agent:GeminiAnalystAgent", model_name="gemini-1.5-flash", **analyst_kwargs)
+    openai_analyst = LazyAgent("OpenAIAnalyst", "agents.openai_llm_analyst_agent:OpenAiAnalystAgent", model_name="gpt-4o-mini", **analyst_kwargs)
+    visualizer = LazyAgent("Visualizer", "agents.visualization_agent:VisualizationAgent")
+
+    # Both analysts only read the processed data and write independent state keys
+    # (gemini_analysis, openai_analysis), so they fan out in parallel and the stage
+    # takes max(Gemini, OpenAI) instead of their sum
+    analysis_stage = ParallelAgent(
+        name="AnalysisStage",
+        sub_agents=[
+            gemini_analyst,
+            openai_analyst
+        ]
+    )
 
     # Define the pipeline using SequentialAgent
     pipeline = SequentialAgent(
@@ -43,56 +168,81 @@ async def main():
         sub_agents=[
             data_collector,
             preprocessor,
-            gemini_analyst,
-            openai_analyst,
+            summarizer,
+            analysis_stage,
             visualizer
         ]
     )
+    attach_callbacks(pipeline, after=release_stage_inputs)
+    # Agents write state directly rather than through event deltas, so the live state seen by this
+    # callback is the only place a finished session's artifact handles can be found
+    callbacks = pipeline.after_agent_callback
+    object.__setattr__(pipeline, "after_agent_callback",
+                       (callbacks if isinstance(callbacks, list) else [callbacks]) + [release_session_artifacts])
+    return pipeline
+
+
+def release_stage_inputs(callback_context):
+    """After-agent callback: free artifacts (e.g. the raw frame) as soon as their last reader has finished."""
+    keys = RELEASE_AFTER.get(callback_context.agent_name)
+    if keys:
+        from agents.artifact_store import release_state_keys
+        release_state_keys(callback_context.session.state, keys)
+    return None
+
+
+def release_session_artifacts(callback_context):
+    """After-agent callback on the pipeline: free every artifact the session still references once its run ends."""
+    from agents.artifact_store import release_state_artifacts
+    release_state_artifacts(callback_context.session.state)
+    return None
 
-    # Set up the Runner and session service
-    app_name = "ADKDataAnalyticsMAS"
+
+async def start_pipeline(pipeline: SequentialAgent, session_id: str,
+                         state: dict) -> Tuple[InMemorySessionService, AsyncGenerator[Event, None]]:
+    """Create a session with `state` and start the pipeline on it; returns the session service and the event stream."""
     session_service = InMemorySessionService()
-    runner = Runner(
-        app_name=app_name,
-        agent=pipeline,
-        session_service=session_service
-    )
+    runner = Runner(app_name=APP_NAME, agent=pipeline, session_service=session_service)
+    await session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id, state=state)
+    # ADK requires a new message to start a run; the agents read their inputs from session state
+    source = state.get("source_path", SAMPLE_DATA_PATH)
+    events = runner.run_async(user_id=USER_ID, session_id=session_id,
+                              new_message=Content(role="user", parts=[Part(text=f"Analyze {source}")]))
+    return session_service, events
 
-    user_id = "tutorial_user"
-    session_id = "demo-session-001"
 
-    # Create the session before running the pipeline
-    await session_service.create_session(
-        app_name=app_name,
-        user_id=user_id,
-        session_id=session_id
-    )
+async def main(demo: bool = False):
+    configure_from_env()
+    if demo:
+        write_sample_data()
+    pipeline = build_pipeline()
+    # Wrap every agent with wall/CPU time, memory, rows, state size and LLM usage measurements
+    tracer = build_tracer()
+    if tracer:
+        tracer.attach(pipeline)
+
+    session_id = "demo-session-001"
+    print(f"Starting Data Analytics Multi-Agent Pipeline for user '{USER_ID}', session '{session_id}'...\n")
+    # Set up the Runner and session, and start the pipeline
+    session_service, events = await start_pipeline(pipeline, session_id, initial_session_state())
 
-    print(f"Starting Data Analytics Multi-Agent Pipeline for user '{user_id}', session '{session_id}'...\n")
-    
-    # Try with None to see if pipeline can start without initial message
-    print(f"📨 Starting pipeline without initial message")
-    
-    async for event in runner.run_async(
-        user_id=user_id,
-        session_id=session_id,
-        new_message=None
-    ):
+    last_event = None
+    async for event in events:
         author = getattr(event, 'author', 'System')
-        for part in getattr(event, 'parts', []):
+        for part in (event.content.parts if event.content else []):
             if getattr(part, 'text', None):
                 print(f"[{author}]: {part.text}")
-        if getattr(event, 'is_final_response', False):
-            print("\nPipeline finished.")
-            if getattr(event, 'parts', None):
-                print("\n--- Final Analysis & Visualization Summary ---")
-                for part in event.parts:
-                    if getattr(part, 'text', None):
-                        print(part.text)
+        last_event = event
+    print("\nPipeline finished.")
+    if last_event is not None and last_event.content:
+        print("\n--- Final Analysis & Visualization Summary ---")
+        for part in last_event.content.parts:
+            if getattr(part, 'text', None):
+                print(part.text)
 
     # Optionally, inspect the session state after the run
     final_session = await session_service.get_session(
-        app_name=app_name, user_id=user_id, session_id=session_id
+        app_name=APP_NAME, user_id=USER_ID, session_id=session_id
     )
     if final_session:
         print("\n📋 Final Session State:")
@@ -104,8 +254,28 @@ async def main():
     else:
         print("Could not retrieve final session.")
 
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        print(f"\n🗄️ LLM cache: {llm_cache.stats()}")
+    if os.getenv("MAS_MEMORY_BUDGET_MB") and not os.getenv("MAS_ARTIFACT_DIR"):
+        from agents.artifact_store import get_artifact_store
+        print(f"💾 Artifact store: {get_artifact_store().stats()}")
+
+    if tracer:
+        print("\n⏱️ Per-stage metrics:")
+        print(tracer.summary())
+        export_trace(tracer)
+
+    # Release pooled provider connections and chart rendering workers
+    await close_clients()
+    from agents.chart_renderer import shutdown_render_pool
+    shutdown_render_pool()
+
 if __name__ == "__main__":
     # Ensure API keys are set in your .env file or environment variables
     # GOOGLE_AI_API_KEY: Get from https://aistudio.google.com/
     # OPENAI_API_KEY: Get from https://platform.openai.com/account/api-keys
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Run the data analytics multi-agent pipeline.")
+    parser.add_argument("--demo", action="store_true", help=f"Write the sample dataset to {SAMPLE_DATA_PATH} first")
+    args = parser.parse_args()
+    asyncio.run(main(demo=args.demo))